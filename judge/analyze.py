@@ -1,104 +1,1155 @@
+import os
 import re
 import sys
+import gc
+import json
+import time
+import mmap
+import glob
+import shutil
+import fnmatch
+import signal
+import socket
+import bisect
+import fcntl
+import resource
+import codecs
+import marshal
+import hashlib
 import argparse
-from collections import deque
+import tempfile
+import subprocess
+import socketserver
+import threading
+import contextlib
+import tracemalloc
+from array import array
+from collections import deque, OrderedDict
+
+from elf import ElfFile, ET_REL
 
 # ==============================================================================
 #  ARCHITECTURE CONFIGURATION
 # ==============================================================================
+# Each architecture declares its objdump dialect here, once:
+#   call / syscall / terminators: mnemonic sets
+#   terminator_rules: terminators that only end a block when a rule holds
+#                     on their operands (see OPERAND_RULES)
+#   nop_rules:        mnemonics dropped as padding when a rule holds
+#   comment:          characters that start an objdump comment
+#   reg_prefix:       register sigil stripped before operand matching
+#   pc_regs:          operands that make a 'loads_pc' terminator a return
 # Define MIPS config once to reuse
 MIPS_CONFIG = {
-    'call':           {'jal', 'jalr', 'bal'},
-    'syscall':        {'syscall'},
-    'terminators':    {'j', 'b', 'jr', 'beq', 'bne'}, 
-    'has_delay_slot': True,
-    'syscall_reg':    r'v0',
+    'call':             {'jal', 'jalr', 'bal'},
+    'syscall':          {'syscall'},
+    'terminators':      {'j', 'b', 'jr', 'beq', 'bne'}, 
+    'terminator_rules': {'beq': 'zero_compare', 'bne': 'zero_compare'},
+    'nop_rules':        {'sll': 'all_zero'},
+    'has_delay_slot':   True,
+    'syscall_reg':      r'v0',
+    'comment':          '#',
+    'reg_prefix':       '$',
 }
 
 ARCH_CONFIG = {
     'mips':   MIPS_CONFIG,
     'mipsel': MIPS_CONFIG,
     'x86': { 
-        'call':           {'call', 'callq'},
-        'syscall':        {'syscall', 'int', 'sysenter'},
-        'terminators':    {'ret', 'retq', 'jmp'},
-        'has_delay_slot': False,
-        'syscall_reg':    r'[er]?ax', 
+        'call':             {'call', 'callq'},
+        'syscall':          {'syscall', 'int', 'sysenter'},
+        'terminators':      {'ret', 'retq', 'jmp'},
+        'terminator_rules': {},
+        'nop_rules':        {},
+        'has_delay_slot':   False,
+        'syscall_reg':      r'[er]?ax', 
+        'comment':          '#',
+        'reg_prefix':       '%',
     },
     'arm': { 
-        'call':           {'bl', 'blx'},
-        'syscall':        {'svc', 'swi'},
-        'terminators':    {'b', 'bx', 'pop'},
-        'has_delay_slot': False,
-        'syscall_reg':    r'r7',
+        'call':             {'bl', 'blx'},
+        'syscall':          {'svc', 'swi'},
+        'terminators':      {'b', 'bx', 'pop'},
+        'terminator_rules': {'pop': 'loads_pc'},
+        'nop_rules':        {},
+        'has_delay_slot':   False,
+        'syscall_reg':      r'r7',
+        'comment':          '@;',
+        'reg_prefix':       '',
+        'pc_regs':          ('pc', 'r15'),
     },
     'aarch64': { 
-        'call':           {'bl', 'blr'},
-        'syscall':        {'svc'},
-        'terminators':    {'b', 'ret'},
-        'has_delay_slot': False,
-        'syscall_reg':    r'[xw]8', 
+        'call':             {'bl', 'blr'},
+        'syscall':          {'svc'},
+        'terminators':      {'b', 'ret'},
+        'terminator_rules': {},
+        'nop_rules':        {},
+        'has_delay_slot':   False,
+        'syscall_reg':      r'[xw]8', 
+        'comment':          '/',
+        'reg_prefix':       '',
     },
     's390x': {
-        'call':           {'brasl', 'basr', 'bras'}, 
-        'syscall':        {'svc'},
-        'terminators':    {'br', 'jg', 'j', 'b'},    
-        'has_delay_slot': False,
-        'syscall_reg':    r'r1', 
+        'call':             {'brasl', 'basr', 'bras'}, 
+        'syscall':          {'svc'},
+        'terminators':      {'br', 'jg', 'j', 'b'},    
+        'terminator_rules': {},
+        'nop_rules':        {},
+        'has_delay_slot':   False,
+        'syscall_reg':      r'r1', 
+        'comment':          '#',
+        'reg_prefix':       '%',
+    },
+    'riscv64': {
+        'call':             {'jal', 'jalr', 'call'},
+        'syscall':          {'ecall'},
+        'terminators':      {'j', 'jr', 'ret', 'tail'},
+        'terminator_rules': {},
+        'nop_rules':        {},
+        'has_delay_slot':   False,
+        'syscall_reg':      r'a7',
+        'comment':          '#',
+        'reg_prefix':       '',
     },
 }
 
+ZERO_REGS = {'0', 'zero', 'r0', '0x0'}
+
+def split_operands(args, spec):
+    """Operands of an instruction with comments and register sigils removed."""
+    for ch in spec['comment']:
+        args = args.split(ch, 1)[0]
+    if spec['reg_prefix']:
+        args = args.replace(spec['reg_prefix'], '')
+    return [op.strip() for op in args.split(',')]
+
+def _all_zero(args, spec):
+    """sll zero,zero,0: three operands, all zero registers."""
+    ops = split_operands(args, spec)
+    return len(ops) == 3 and all(op in ZERO_REGS for op in ops)
+
+def _zero_compare(args, spec):
+    """beq zero,zero,target: comparing zero with zero always branches."""
+    ops = split_operands(args, spec)
+    return len(ops) >= 2 and ops[0] in ZERO_REGS and ops[1] in ZERO_REGS
+
+def _loads_pc(args, spec):
+    """pop {..., pc} returns; pop {r4} does not."""
+    return any(reg in args for reg in spec['pc_regs'])
+
+# Operand predicates referenced by name from terminator_rules / nop_rules
+OPERAND_RULES = {
+    'all_zero':     _all_zero,
+    'zero_compare': _zero_compare,
+    'loads_pc':     _loads_pc,
+}
+
+# Dumps are consumed in fixed-size chunks so that peak memory does not
+# grow with the size of the objdump output.
+READ_CHUNK = 1 << 20
+
+# Bump whenever parsing or graph building changes what ends up in `functions`,
+# so stale cache entries are never served.
+ANALYZER_VERSION = 3
+
+# ==============================================================================
+#  RESULT CACHE
+# ==============================================================================
+class EntryDirectory:
+    """
+    A directory of marshal files shared by concurrent processes. Writes are
+    atomic (temp file + rename) so parallel workers never observe partial
+    files; eviction is LRU by mtime and is serialised through an advisory
+    lock. Subclasses pick the file SUFFIX and what a file holds.
+    """
+    SUFFIX = ''
+
+    def __init__(self, directory, max_bytes=256 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name + self.SUFFIX)
+
+    def _read(self, name):
+        """Returns the dict stored under `name`, or None if it is missing or unreadable."""
+        try:
+            with open(self._path(name), 'rb') as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _write(self, name, data):
+        """Atomically writes `data` under `name` and evicts. Returns False if it could not be written."""
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(tmp, self._path(name))
+        except OSError:
+            return False
+        self._evict()
+        return True
+
+    def _touch(self, name):
+        """Refreshes the LRU position of `name`."""
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Deletes least recently used files until the directory fits max_bytes."""
+        try:
+            lock = open(os.path.join(self.directory, '.lock'), 'w')
+        except OSError:
+            return
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # Another worker is already evicting
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for e in it:
+                    if not e.name.endswith(self.SUFFIX): continue
+                    try:
+                        st = e.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes: break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+class AnalysisCache(EntryDirectory):
+    """
+    Persistent cache of finished function graphs, one marshal file per entry.
+    Entries are keyed by the dump content hash, the architecture and
+    ANALYZER_VERSION.
+    """
+    SUFFIX = '.graph'
+
+    @staticmethod
+    def key(digest, arch):
+        return hashlib.blake2b(f"{digest}:{arch}:{ANALYZER_VERSION}".encode(), digest_size=20).hexdigest()
+
+    def load(self, key):
+        """Returns the cached state or None. Any unreadable entry is a miss."""
+        state = self._read(key)
+        if state is not None:
+            self._touch(key)
+        return state
+
+    def store(self, key, state):
+        self._write(key, state)
+
+def file_digest(path):
+    """Content hash of a dump file, read in READ_CHUNK pieces."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# ==============================================================================
+#  SHARED SUMMARY STORE
+# ==============================================================================
+class SummaryStore(EntryDirectory):
+    """
+    Content-addressed store of parsed label sections, shared by every
+    analysis that points at the same directory. Static submissions all
+    carry the same libc and runtime code, so after the first dump only the
+    student's own sections are lexed and summarized.
+
+    Entries are keyed by the architecture, ANALYZER_VERSION and the
+    section's address-independent fingerprint, and hold what the later
+    passes read from a block, by name (see AssemblyAnalyzer._store_entry).
+    Fingerprinting costs about as much as lexing, so each section's raw
+    bytes also get an alias (raw_key -> key, shape, operands): a section
+    seen byte for byte before is found without being decoded at all.
+    Each analysis appends the entries it was missing as one marshal pack,
+    named `<arch>-<hash>`; packs are written atomically and only ever read
+    whole, so concurrent workers at worst store an entry twice. A process
+    loads the packs of an architecture the first time it analyzes a dump of
+    it, and picks up new ones on refresh(). Eviction is LRU by pack mtime.
+    """
+    SUFFIX = '.pack'
+
+    def __init__(self, directory, max_bytes=256 << 20):
+        super().__init__(directory, max_bytes)
+        self.entries = {}   # key -> (pack name, entry)
+        self.packs = {}     # pack name -> keys it provides
+        self.used = set()
+
+    @staticmethod
+    def key(arch, shape, operands):
+        prefix = f"{arch}:{ANALYZER_VERSION}:".encode()
+        return hashlib.blake2b(prefix + shape + operands, digest_size=16).digest()
+
+    @staticmethod
+    def raw_key(arch, raw):
+        prefix = f"{arch}:{ANALYZER_VERSION}:raw:".encode()
+        return hashlib.blake2b(prefix + raw, digest_size=16).digest()
+
+    def alias(self, raw_key):
+        """(key, shape, operands) recorded for a section's raw bytes, or None."""
+        found = self.entries.get(raw_key)
+        if found is None: return None
+        self.used.add(found[0])
+        return found[1]
+
+    def load(self, key):
+        found = self.entries.get(key)
+        if found is None: return None
+        self.used.add(found[0])
+        # Entries stay marshalled until used, which keeps packs quick to load
+        return marshal.loads(found[1])
+
+    def refresh(self, arch):
+        """Loads the packs for `arch` written since the last call and forgets evicted ones."""
+        prefix = arch + '-'
+        try:
+            names = {name[:-len(self.SUFFIX)] for name in os.listdir(self.directory)
+                     if name.startswith(prefix) and name.endswith(self.SUFFIX)}
+        except OSError:
+            return
+        for name in [name for name in self.packs if name.startswith(prefix) and name not in names]:
+            for key in self.packs.pop(name):
+                if self.entries.get(key, (None,))[0] == name:
+                    del self.entries[key]
+        for name in names - self.packs.keys():
+            pack = self._read(name)
+            if pack is None: continue
+            self._add(name, pack)
+
+    def store(self, arch, pack, aliases=None):
+        """
+        Writes `pack` (key -> entry) and `aliases` (raw_key -> key, shape,
+        operands) as a new pack for `arch` and refreshes the LRU position of
+        used ones.
+        """
+        for name in self.used:
+            self._touch(name)
+        self.used.clear()
+        if not pack and not aliases: return
+        pack = {key: marshal.dumps(entry) for key, entry in pack.items()}
+        pack.update(aliases or {})
+        name = f"{arch}-{hashlib.blake2b(b''.join(sorted(pack)), digest_size=20).hexdigest()}"
+        if self._write(name, pack):
+            self._add(name, pack)
+
+    def _add(self, name, pack):
+        self.packs[name] = tuple(pack)
+        for key, entry in pack.items():
+            self.entries.setdefault(key, (name, entry))
+
+# ==============================================================================
+#  INSTRUMENTATION
+# ==============================================================================
+class AnalysisStats:
+    """
+    Collects per-phase wall time and memory for one analysis. Memory is the
+    process high-water RSS after each phase; when tracemalloc is tracing
+    (--stats=memory) the traced peak inside each phase is reported too.
+    Counters are filled in by the analyzer from cheap in-loop tallies.
+    """
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing: tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += elapsed
+            entry['calls'] += 1
+            entry['maxrss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            if tracing:
+                peak = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+                entry['peak_mb'] = max(entry.get('peak_mb', 0), peak)
+
+    def report(self, analyzer):
+        """JSON-serialisable summary of the phases and the analyzer's counters."""
+        phases = {name: dict(entry, seconds=round(entry['seconds'], 6))
+                  for name, entry in self.phases.items()}
+        lines = dict(analyzer.line_counts, label=len(analyzer.label_order))
+        lines['other'] = max(0, lines['total'] - sum(v for k, v in lines.items() if k != 'total'))
+        report = {
+            'file': analyzer.filepath or analyzer.elf_path,
+            'arch': analyzer.arch_name,
+            'cache': analyzer.cache_status,
+            'phases': phases,
+            'lines': lines,
+            'syscalls': dict(analyzer.syscall_outcomes),
+            'search': dict(analyzer.search_counts),
+            'sizes': {
+                'labels': len(analyzer.label_order),
+                'functions': len(analyzer.functions),
+                'mnemonics': len(analyzer.mnemonics.names),
+                'symbols': len(analyzer.symbols.names),
+            },
+        }
+        if analyzer.incremental_counts is not None:
+            report['incremental'] = dict(analyzer.incremental_counts)
+        if analyzer.store_counts is not None:
+            report['store'] = dict(analyzer.store_counts)
+        if analyzer.lazy_counts is not None:
+            report['lazy'] = dict(analyzer.lazy_counts)
+        if analyzer.shards is not None:
+            report['sizes']['shards'] = analyzer.shards
+        if analyzer.partial is not None:
+            report['partial'] = analyzer.partial
+        return report
+
+# ==============================================================================
+#  RESOURCE BUDGETS
+# ==============================================================================
+PAGE_SIZE = resource.getpagesize()
+
+def current_rss():
+    """Resident set size of this process in bytes (the high-water mark where /proc is missing)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class AnalysisBudget:
+    """
+    Limits for analyzing untrusted input: wall time, input lines, labels,
+    memory growth and predecessor blocks walked per syscall. The analyzer
+    checks them cooperatively in its hot loops (per input chunk, per
+    section, per closure component); when one runs out it stops that work
+    and keeps what it has. `exceeded` then says why, and every answer is
+    flagged as partial. start() restarts the clock and takes the current
+    RSS as the memory baseline, so a long-lived analyzer (or a daemon
+    holding many) can be given a fresh budget per request.
+    """
+    def __init__(self, seconds=None, max_lines=None, max_labels=None, max_memory_mb=None, max_steps=None):
+        self.seconds = seconds
+        self.max_lines = max_lines
+        self.max_labels = max_labels
+        self.max_bytes = max_memory_mb << 20 if max_memory_mb is not None else None
+        self.max_steps = max_steps
+        self.exceeded = None
+        self.start()
+
+    def start(self):
+        self.deadline = time.monotonic() + self.seconds if self.seconds is not None else None
+        self.base_rss = current_rss() if self.max_bytes is not None else 0
+
+    def check(self):
+        """True while the wall-clock or memory limit is exceeded."""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exceed(f"wall time limit of {self.seconds:g}s reached")
+            return True
+        if self.max_bytes is not None and current_rss() - self.base_rss > self.max_bytes:
+            self.exceed(f"memory limit of {self.max_bytes >> 20} MB reached")
+            return True
+        return False
+
+    def admits(self, lines, labels):
+        """Does an input of this size fit the line and label limits?"""
+        return (self.max_lines is None or lines <= self.max_lines) and \
+               (self.max_labels is None or labels <= self.max_labels)
+
+    def exceed(self, reason):
+        """Records the first limit that ran out and warns once on stderr."""
+        if self.exceeded is None:
+            self.exceeded = reason
+            print(f"Warning: {reason}; results are partial", file=sys.stderr)
+
+# ==============================================================================
+#  COMPACT RECORDS
+# ==============================================================================
+class SymbolTable:
+    """Interns strings to dense integer ids, which double as bit positions."""
+    __slots__ = ('names', 'ids')
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def bits(self, names):
+        mask = 0
+        for name in names:
+            mask |= 1 << self.intern(name)
+        return mask
+
+    def decode(self, mask):
+        names = self.names
+        return [names[i] for i in iter_bits(mask)]
+
+def iter_bits(mask):
+    """Yields the positions of the set bits of an int, lowest first."""
+    # Scanning the binary string keeps the per-bit work in C
+    digits = bin(mask)[:1:-1]
+    i = digits.find('1')
+    while i != -1:
+        yield i
+        i = digits.find('1', i + 1)
+
+class Block:
+    """
+    Instructions under one label. Mnemonics are interned ids in an array and
+    operands plain strings (None for entries synthesised from relocations).
+    Calls and syscalls are sparse maps from instruction index to callee
+    symbol id / resolved syscall number. `flow` and `summary` cache facts
+    that depend only on the block's own contents (branch targets and
+    fall-through, syscall register effect), so a block reused by an
+    incremental run never recomputes them. Blocks merged from parallel
+    shards arrive with both facts set and no operands.
+    """
+    __slots__ = ('mnems', 'args', 'calls', 'syscalls', 'flow', 'summary')
+
+    def __init__(self):
+        self.mnems = array('I')
+        self.args = []
+        self.calls = {}
+        self.syscalls = {}
+        self.flow = None
+        self.summary = None
+
+    def __len__(self):
+        return len(self.mnems)
+
+    def append(self, mnem_id, args):
+        self.mnems.append(mnem_id)
+        self.args.append(args)
+        return len(self.mnems) - 1
+
+    def is_plain(self, idx):
+        """True for ordinary instructions (not calls, syscalls or reloc stubs)."""
+        return self.args[idx] is not None and idx not in self.calls and idx not in self.syscalls
+
+class FunctionSummary:
+    """Bitsets over interned callee, mnemonic and syscall-number ids."""
+    __slots__ = ('callees', 'instrs', 'syscalls')
+
+    def __init__(self, callees=0, instrs=0, syscalls=0):
+        self.callees = callees
+        self.instrs = instrs
+        self.syscalls = syscalls
+
+# ==============================================================================
+#  REACHABILITY
+# ==============================================================================
+class CallGraphClosure:
+    """
+    Transitive summaries of a call graph, computed once.
+
+    The graph is condensed into strongly connected components (iterative
+    Tarjan, so deep call chains don't hit the recursion limit). Components
+    come out in reverse topological order, which lets callee, instruction and
+    syscall bitsets be propagated bottom-up in a single pass.
+
+    Given the closure of a previous version of the graph (`base`, over the
+    same symbol ids) and the functions whose summary changed, only the
+    changed functions and their transitive callers are recomputed; every
+    other component is copied from the base.
+
+    With a `budget`, the wall-clock and memory limits are checked between
+    components; once one runs out, the remaining components keep only
+    their own members' facts and direct callees.
+    """
+    def __init__(self, functions, symbols, base=None, changed=(), budget=None):
+        # Every function and callee is interned in `symbols`; external
+        # callees (not defined in the dump) become leaf nodes.
+        ids = symbols.ids
+        n = len(symbols.names)
+        succ = [()] * n
+        for name, f in functions.items():
+            succ[ids[name]] = tuple(iter_bits(f.callees))
+        self.edges = sum(map(len, succ))
+
+        self.ids = ids
+        self.comp_of = comp_of = [-1] * n
+        self.reach = reach = []
+        self.instrs = instrs = []
+        self.syscalls = syscalls = []
+        self.cyclic = []
+        self.stale = self._stale(succ, base, [ids[name] for name in changed]) if base is not None else None
+        if self.stale is not None:
+            # Components untouched by the change keep their base summaries
+            remap = {}
+            for v, c in enumerate(base.comp_of):
+                if v in self.stale: continue
+                d = remap.get(c)
+                if d is None:
+                    d = remap[c] = len(reach)
+                    reach.append(base.reach[c])
+                    instrs.append(base.instrs[c])
+                    syscalls.append(base.syscalls[c])
+                    self.cyclic.append(base.cyclic[c])
+                comp_of[v] = d
+        comps = self._condense(succ, comp_of, len(reach))
+
+        # Bottom-up propagation over the condensation DAG
+        names = symbols.names
+        cut = False
+        for k, members in enumerate(comps):
+            if budget is not None and not cut and not k & 1023:
+                cut = budget.check()
+            c = len(reach)
+            r = ins = sc = 0
+            cyclic = len(members) > 1
+            for v in members:
+                r |= 1 << v
+                f = functions.get(names[v])
+                if f is not None:
+                    ins |= f.instrs
+                    sc |= f.syscalls
+                for w in succ[v]:
+                    d = comp_of[w]
+                    if d == c:
+                        cyclic = True
+                        continue
+                    if cut:
+                        r |= 1 << w
+                        continue
+                    r |= reach[d]
+                    ins |= instrs[d]
+                    sc |= syscalls[d]
+            reach.append(r)
+            instrs.append(ins)
+            syscalls.append(sc)
+            self.cyclic.append(cyclic)
+
+    @staticmethod
+    def _stale(succ, base, changed):
+        """Changed nodes, nodes the base never saw, and everything that reaches them."""
+        preds = [[] for _ in succ]
+        for v, ws in enumerate(succ):
+            for w in ws:
+                preds[w].append(v)
+        stale = set(changed)
+        stale.update(range(len(base.comp_of), len(succ)))
+        stack = list(stale)
+        while stack:
+            for p in preds[stack.pop()]:
+                if p not in stale:
+                    stale.add(p)
+                    stack.append(p)
+        return stale
+
+    @staticmethod
+    def _condense(succ, comp_of, first):
+        """
+        Assigns component ids from `first` on to every node whose comp_of is
+        still -1 and returns the member lists in reverse topological order.
+        Nodes that already have a component are finished leaves to Tarjan.
+        """
+        n = len(succ)
+        index = [-1 if c == -1 else 0 for c in comp_of]
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        comps = []
+        counter = 0
+        for root in range(n):
+            if index[root] != -1: continue
+            index[root] = low[root] = counter; counter += 1
+            stack.append(root); on_stack[root] = True
+            work = [(root, iter(succ[root]))]
+            while work:
+                v, it = work[-1]
+                for w in it:
+                    if index[w] == -1:
+                        index[w] = low[w] = counter; counter += 1
+                        stack.append(w); on_stack[w] = True
+                        work.append((w, iter(succ[w])))
+                        break
+                    if on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                else:
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        if low[v] < low[u]: low[u] = low[v]
+                    if low[v] == index[v]:
+                        members = []
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            comp_of[w] = first + len(comps)
+                            members.append(w)
+                            if w == v: break
+                        comps.append(members)
+        return comps
+
+    def callees(self, func):
+        """Bitset of everything reachable through at least one call edge."""
+        v = self.ids[func]
+        c = self.comp_of[v]
+        if self.cyclic[c]:
+            return self.reach[c]
+        return self.reach[c] & ~(1 << v)
+
+    def instructions(self, func):
+        return self.instrs[self.comp_of[self.ids[func]]]
+
+    def syscall_values(self, func):
+        return self.syscalls[self.comp_of[self.ids[func]]]
+
+# ==============================================================================
+#  LAZY LABEL INDEX
+# ==============================================================================
+class DumpIndex:
+    """
+    Byte offsets of every label section of a dump file, found by scanning
+    an mmap of it, plus which sections mention a name in a `<name>` or
+    `<name+off>` annotation and every relocation target. Nothing is
+    decoded until a section's lines are asked for.
+    """
+    LABEL = re.compile(r'^([0-9a-fA-F]*)\s*<([^>]+)>:$')
+    # objdump's own label lines; any other '>:' in the file sends the scan down the exact path
+    PLAIN_LABEL = re.compile(rb'\n[0-9a-fA-F]* <([^>\n]+)>:(?=\n|\Z)')
+    # Superset of the lexer's call targets (`<name>`, `<name+0x..>`) and branch targets (`<name>`)
+    ANNOTATION = re.compile(rb'<([^>\n+]+)(>(?!:)|\+)')
+    RELOC = re.compile(rb'^[^\S\n]*[0-9a-fA-F]+:[^\S\n]+R_\w+[^\S\n]+(\S+)', re.M)
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        data = self._map if self._map is not None else b''
+        self.line_count = sum(data[i:i + READ_CHUNK].count(b'\n') for i in range(0, len(data), READ_CHUNK))
+        self.line_count += len(data) > 0 and data[-1:] != b'\n'
+
+        # Per section, in file order: label, body start and end
+        self.labels = labels = []
+        self.starts = starts = []
+        self.ends = ends = []
+        found = list(self.PLAIN_LABEL.finditer(data))
+        if len(found) == len(re.findall(rb'>:', data)):
+            for m in found:
+                labels.append(m.group(1).decode('utf-8', 'replace'))
+                starts.append(m.end() + 1)
+                ends.append(m.start() + 1)
+        else:
+            # Same candidates and check as _iter_sections
+            p = data.find(b'>:')
+            while p >= 0:
+                end = data.find(b'\n', p)
+                if end < 0: end = len(data)
+                line_start = data.rfind(b'\n', 0, p) + 1
+                line = data[line_start:end].decode('utf-8', 'replace').strip()
+                label_match = self.LABEL.match(line) if line[-2:] == '>:' else None
+                if label_match:
+                    labels.append(label_match.group(2))
+                    starts.append(end + 1)
+                    ends.append(line_start)
+                p = data.find(b'>:', end)
+        # Each section ends where the next label line starts
+        del ends[:1]
+        if labels: ends.append(len(data))
+
+        # Label -> section indexes; the last section of a label is the one the lexer keeps
+        self.positions = {}
+        for i, label in enumerate(labels):
+            self.positions.setdefault(label, []).append(i)
+
+        # Raw name -> sections annotating it at all / as a plain `<name>`
+        self._mentions = mentions = {}
+        self._plain = plain = {}
+        findall = self.ANNOTATION.findall
+        for i in range(len(labels)):
+            for name, kind in findall(data, starts[i], ends[i]):
+                sections = mentions.get(name)
+                if sections is None: mentions[name] = [i]
+                elif sections[-1] != i: sections.append(i)
+                if kind == b'>':
+                    sections = plain.get(name)
+                    if sections is None: plain[name] = [i]
+                    elif sections[-1] != i: sections.append(i)
+
+        # Normalised exactly as the lexer does; relocations before the first label are never read
+        self.reloc_targets = set()
+        if labels and data.find(b'R_', starts[0]) >= 0:
+            for raw in self.RELOC.findall(data, starts[0]):
+                target = raw.decode('utf-8', 'replace').split('@')[0]
+                target = re.sub(r'[+-]0x[0-9a-fA-F]+$', '', target)
+                if target.startswith('.') or target.startswith('*') or target == 'ABS' or target == 'UND':
+                    continue
+                self.reloc_targets.add(target)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+    def lines(self, i):
+        """Stripped lines of section `i`, label line first, as _iter_blocks expects."""
+        data = self._map
+        start = self.starts[i]
+        head = data[data.rfind(b'\n', 0, start - 1) + 1:start - 1]
+        text = data[start:self.ends[i]].decode('utf-8', 'replace')
+        return [head.decode('utf-8', 'replace').strip()] + [line.strip() for line in text.split('\n')]
+
+    def _labels_of(self, index, name):
+        sections = index.get(name.encode('utf-8'), ())
+        if '\ufffd' in name:
+            # Undecodable bytes: the raw name may be anything that decodes to `name`
+            sections = [i for raw, found in index.items()
+                        if raw.decode('utf-8', 'replace') == name for i in found]
+        return list(dict.fromkeys(self.labels[i] for i in sections))
+
+    def mentioning(self, name):
+        """Labels of the sections that might call `name`."""
+        return self._labels_of(self._mentions, name)
+
+    def branching_to(self, name):
+        """Labels of the sections that might branch to `name`."""
+        return self._labels_of(self._plain, name)
+
+def _mode_disabled(flag, reasons):
+    """
+    Warns that `flag` is ignored for the first (condition, reason) pair
+    whose condition holds. Returns whether one did.
+    """
+    for holds, reason in reasons:
+        if holds:
+            print(f"Warning: {flag} is ignored with {reason}", file=sys.stderr)
+            return True
+    return False
+
 class AssemblyAnalyzer:
-    def __init__(self, filepath, arch='mips'):
+    def __init__(self, filepath, arch='mips', cache=None, elf=None, opener=None, digest=None, tee=None,
+                 stats=None, incremental=False, base=None, store=None, lazy=False, parse_jobs=1,
+                 shard=None, budget=None):
+        """
+        `opener` is an optional callable returning a binary stream to parse
+        instead of opening `filepath`; it is only called on a cache miss.
+        `digest` identifies the input for the cache when it is known up
+        front, and `tee` receives a copy of the raw dump bytes. `stats` is
+        an optional AnalysisStats that times every phase.
+
+        `incremental` fingerprints every label section so this analysis can
+        later serve as `base` for a new version of the dump: sections whose
+        fingerprint is unchanged reuse the base's parsed blocks, functions
+        made of reused blocks keep their summaries, and the closure is only
+        recomputed for callers of functions that changed.
+
+        `store` is an optional SummaryStore: sections it already holds are
+        rebuilt from their entries instead of being lexed, and the sections
+        lexed here are added to it.
+
+        `lazy` only indexes the label offsets of a dump file up front. A
+        function is parsed, resolved and summarized the first time a query
+        asks about it (recursive queries: everything reachable from it), so
+        code the queries never reach is never lexed. Answers are the same
+        as with a full analysis.
+
+        `parse_jobs` > 1 lexes a dump file in that many worker processes,
+        each on a byte range starting at a label line (`shard`, used by the
+        workers themselves), and merges the ranges in file order before the
+        global passes run, so the result is exactly that of a serial parse.
+
+        `budget` is an optional AnalysisBudget. When one of its limits runs
+        out the analysis stops early and keeps what it has (see `partial`);
+        such a result is never cached or stored. Dumps under a budget are
+        lexed serially.
+        """
         self.filepath = filepath
+        self.elf_path = elf
+        self._opener = opener
+        self._tee = tee
+        self._shard = shard
+        self.shards = None
+        self.budget = budget
         self.arch_name = arch if arch in ARCH_CONFIG else 'mips' 
         # Safety fallback if 'mips' is missing from config (handled above now)
         if self.arch_name not in ARCH_CONFIG:
              print(f"Warning: Architecture '{self.arch_name}' not found in config. Defaulting to mipsel logic if available or crashing.")
         self.spec = ARCH_CONFIG.get(self.arch_name, ARCH_CONFIG.get('mipsel'))
+        reg_pattern = self.spec['syscall_reg']
+        self._reg_regex = re.compile(r'\b' + reg_pattern + r'\b')
+        self._reg_self_val = reg_pattern.replace('[xw]', '').replace('r', '')
+        # First <target> before any comment
+        self._branch_pat = re.compile(r'^[^' + re.escape(self.spec['comment']) + r'<]*<([^>+]+)>')
+        self._mnem_kinds = {}
         
         self.functions = {} 
         self.label_order = []
         self.raw_blocks = {}
+        # Interned names: mnemonics, function/callee symbols, syscall numbers
+        self.mnemonics = SymbolTable()
+        self.symbols = SymbolTable()
+        self.syscall_numbers = SymbolTable()
         # Known standard entry points or section markers to keep logic clean
         self.identified_funcs = set(['main', '_start', '__start', '_init', '_fini'])
+        self._hasher = None
+        self._syscall_blocks = set()
+        self._closure = None
+        self._memo = {}
+        self._raw_size = None
+        self.label_addrs = {}
+        # ELF mode: function boundaries come from the symbol table
+        self.elf_funcs = None
+        # Instrumentation: counters are always kept, phases only timed with `stats`
+        self.stats = stats
+        self.cache_status = None
+        self.line_counts = dict.fromkeys(('total', 'instruction', 'reloc', 'directive', 'filtered_nop'), 0)
+        self.syscall_outcomes = dict.fromkeys(('immediate', 'same_block', 'predecessor', 'unknown'), 0)
+        self.search_counts = dict.fromkeys(('dataflow_region', 'dataflow_visits',
+                                            'closure_nodes', 'closure_edges'), 0)
+        # Incremental mode: label -> section fingerprints (see
+        # _iter_incremental) and function -> member blocks, kept for the
+        # next version of the dump
+        self._sections = None
+        self._func_blocks = None
+        self._base = None
+        self._stale_operands = {}
+        self._changed = None
+        self._base_closure = None
+        self.incremental_counts = None
+        if incremental or base is not None:
+            self._sections = {}
+            self._func_blocks = {}
+            self.incremental_counts = dict.fromkeys(('sections', 'sections_reused', 'functions_reused',
+                                                     'functions_changed', 'closure_recomputed'), 0)
+            if base is not None and base._sections is not None and base.arch_name == self.arch_name:
+                self._base = base
+                # Reused blocks hold the base's interned ids
+                self.mnemonics = SymbolTable(base.mnemonics.names)
+                self.symbols = SymbolTable(base.symbols.names)
+                self.syscall_numbers = SymbolTable(base.syscall_numbers.names)
+        # Shared summary store: key -> entry for the sections it lacked
+        self._store = store
+        self._store_new = {}
+        self._store_aliases = {}
+        self.store_counts = None
+        if store is not None:
+            self.store_counts = dict.fromkeys(('lookups', 'hits', 'raw_hits', 'stored'), 0)
+        # Lazy mode: section index, plus what has been decided so far
+        self._index = None
+        self._starts = {}
+        self._preds = {}
+        self._resolved = set()
+        self._reached = set()
+        self._complete = False
+        self.lazy_counts = None
+
+        if elf is not None:
+            with self.phase('elf'), ElfFile(elf) as image:
+                self._load_elf(image, structural_only=filepath is None)
+            if filepath is None: return
         
-        self._parse_file()
-        self._finalize_functions()
-        self._build_function_graph()
+        # Warm path: a cached graph replaces all parsing work
+        cache_key = None
+        elf_digest = file_digest(elf) if cache is not None and elf is not None else ''
+        if cache is not None:
+            if digest is None and opener is None and filepath != '-' and os.path.isfile(filepath):
+                digest = file_digest(filepath)
+            if digest is not None:
+                cache_key = cache.key(digest + elf_digest, self.arch_name)
+                with self.phase('cache'):
+                    state = cache.load(cache_key)
+                    if state is not None:
+                        self._import_state(state)
+                self.cache_status = 'miss' if state is None else 'hit'
+                if state is not None:
+                    # No blocks to share with a later incremental run
+                    self._sections = self._func_blocks = self._base = None
+                    return
+            else:
+                # Pipes can't be hashed up front; hash while streaming instead
+                self._hasher = hashlib.blake2b(digest_size=20)
+
+        # Lazy mode needs random access, and its partial graph is never cached
+        seekable = opener is None and filepath != '-' and os.path.isfile(filepath)
+        if lazy and not _mode_disabled('--lazy', ((self._sections is not None, 'incremental regrading'),
+                                                  (store is not None, 'a summary store'),
+                                                  (elf is not None, '--elf'),
+                                                  (not seekable, 'piped input'))):
+            with self.phase('index'):
+                index = DumpIndex(filepath)
+            # A dump over the line or label limit is cut short by the serial lexer instead
+            if budget is None or budget.admits(index.line_count, len(index.labels)):
+                self._index = index
+                self.label_order = index.labels
+                self.line_counts['total'] = index.line_count
+                self.identified_funcs |= index.reloc_targets
+                self.lazy_counts = {'sections': len(index.labels), 'sections_parsed': 0, 'functions_built': 0}
+                _mode_disabled('--parse-jobs', ((parse_jobs > 1, '--lazy'),))
+                return
+            index.close()
+            _mode_disabled('--lazy', ((True, 'a dump over the line or label limit'),))
+
+        with self.phase('parse'):
+            if store is not None:
+                store.refresh(self.arch_name)
+            if parse_jobs > 1 and not _mode_disabled('--parse-jobs', (
+                    (self._sections is not None, 'incremental regrading'),
+                    (store is not None, 'a summary store'),
+                    (budget is not None, 'resource limits'),
+                    (not seekable or self._hasher is not None, 'piped input'))):
+                self._parse_parallel(parse_jobs)
+            else:
+                self._parse_file()
+        if shard is not None:
+            # Worker side of _parse_parallel: per-block facts only, the rest is global.
+            # With flow and summary known, the parent never needs the operand text.
+            for block in self.raw_blocks.values():
+                block.flow = self._block_flow(block)
+                block.summary = self._summarize_block(block)
+            return
+        with self.phase('syscalls'):
+            self._resolve_syscalls()
+        if self.elf_funcs is None:
+            with self.phase('finalize'):
+                self._finalize_functions()
+        with self.phase('graph'):
+            self._build_function_graph()
+        # Only the parts of the base still needed for the closure are kept
+        self._base = None
+        self._stale_operands = {}
+        if store is not None:
+            if self.partial is not None:
+                # The last section may have been cut short
+                self._store_new = {}
+                self._store_aliases = {}
+            self.store_counts['stored'] = len(self._store_new)
+            with self.phase('store'):
+                store.store(self.arch_name, self._store_new, self._store_aliases)
+            self._store = None
+            self._store_new = {}
+            self._store_aliases = {}
+
+        if cache is not None and self.partial is None:
+            if self._hasher is not None:
+                cache_key = cache.key(self._hasher.hexdigest() + elf_digest, self.arch_name)
+            if cache_key is not None:
+                self.cache_status = self.cache_status or 'miss'
+                cache.store(cache_key, self._export_state())
+
+    @property
+    def partial(self):
+        """Why the analysis stopped short of the whole input (a budget ran out), or None."""
+        return self.budget.exceeded if self.budget is not None else None
+
+    def phase(self, name):
+        """Context manager timing `name` when stats are enabled, a no-op otherwise."""
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.phase(name)
+
+    def _load_elf(self, image, structural_only):
+        """
+        Takes function names, start addresses and sizes from the ELF symbol
+        table. In structural-only mode (no disassembly) the call graph is
+        built from relocations against executable sections plus the direct
+        calls decoded from the code bytes, so no text is parsed at all.
+        """
+        funcs = image.function_symbols()
+        self.elf_funcs = {name: (start, size) for name, start, size, _ in funcs}
+        self.identified_funcs.update(self.elf_funcs)
+        if not structural_only: return
+
+        intern_sym = self.symbols.intern
+        for name, _, _, _ in funcs:
+            intern_sym(name)
+            self.functions[name] = FunctionSummary()
+
+        # Relocation offsets and symbol values agree in both objects
+        # (section-relative) and linked images (addresses)
+        ranges = sorted(((shndx, start, start + max(size, 1), name)
+                         for name, start, size, shndx in funcs))
+        starts = [(r[0], r[1]) for r in ranges]
+        called = set()
+        def add_call(shndx, offset, target):
+            key = (shndx, offset)
+            i = bisect.bisect_right(starts, key) - 1
+            if i < 0: return
+            r_shndx, start, end, caller = ranges[i]
+            if r_shndx != key[0] or not start <= offset < end: return
+            self.functions[caller].callees |= 1 << intern_sym(target)
+            called.add(target)
+
+        found = False
+        for call in image.call_relocations():
+            found = True
+            add_call(*call)
+        for call in image.direct_calls():
+            add_call(*call)
+        if not found and image.e_type != ET_REL:
+            print(f"Warning: {image.path} has no relocations for code; call edges only cover direct calls "
+                  "decoded from the code (pass the dump file as well)", file=sys.stderr)
+            return
+        # A static function nobody calls is most likely called in a way the
+        # reader could not decode (indirectly, or through an unusual encoding)
+        unseen = sorted(image.local_functions() - called)
+        if unseen:
+            print(f"Warning: {image.path}: no calls found to static function(s) {', '.join(unseen[:5])}"
+                  f"{', ...' if len(unseen) > 5 else ''}; pass the dump file as well if they are used",
+                  file=sys.stderr)
+
+    def _export_state(self):
+        """Serialisable snapshot of the function graph (marshal-compatible)."""
+        return {
+            'functions': {name: (tuple(self.symbols.decode(f.callees)),
+                                 tuple(self.mnemonics.decode(f.instrs)),
+                                 tuple(self.syscall_numbers.decode(f.syscalls)))
+                          for name, f in self.functions.items()},
+        }
+
+    def _import_state(self, state):
+        for name in state['functions']:
+            self.symbols.intern(name)
+        self.functions = {
+            name: FunctionSummary(self.symbols.bits(callees), self.mnemonics.bits(instrs),
+                                  self.syscall_numbers.bits(syscalls))
+            for name, (callees, instrs, syscalls) in state['functions'].items()
+        }
 
     def _is_terminator(self, mnem, args):
         """
         Determines if an instruction stops control flow from falling through to the next line.
         """
-        if mnem in self.spec['terminators']:
-            # ARM pop special case: only a terminator if it loads into PC
-            if self.arch_name == 'arm' and mnem == 'pop':
-                # pop {..., pc} -> return (terminator)
-                # pop {r7} -> standard pop (not terminator)
-                if 'pc' not in args and 'r15' not in args:
-                    return False
-
-            # MIPS beq 0,0 special case (Unconditional Jump via Conditional Branch)
-            if mnem in ['beq', 'bne'] and self.arch_name in ['mips', 'mipsel']:
-                cleaned = re.sub(r'[$,]', ' ', args).split()
-                if len(cleaned) >= 2:
-                    op1, op2 = cleaned[0], cleaned[1]
-                    zeros = ['zero', '0']
-                    if op1 in zeros and op2 in zeros:
-                        return True
-                return False
-            return True
-        return False
+        if mnem not in self.spec['terminators']:
+            return False
+        # e.g. ARM pop only returns when it loads pc, MIPS beq only
+        # always branches when comparing zero with zero
+        rule = self.spec['terminator_rules'].get(mnem)
+        return rule is None or OPERAND_RULES[rule](args, self.spec)
+
+    # Memory references and numbers, for _extract_immediate
+    PAREN_REF = re.compile(r'\(.*?\)')
+    BRACKET_REF = re.compile(r'\[.*?\]')
+    NUMBER = re.compile(r'(?:0x[0-9a-fA-F]+)|(?:\b-?\d+\b)')
 
     def _extract_immediate(self, args_str):
         """Extracts the last immediate value from a string."""
         # Remove memory references [r0, #4] -> r0, #4
-        args_no_mem = re.sub(r'\(.*?\)', '', args_str)
-        args_no_mem = re.sub(r'\[.*?\]', '', args_no_mem)
+        args_no_mem = self.PAREN_REF.sub('', args_str)
+        args_no_mem = self.BRACKET_REF.sub('', args_no_mem)
         
         # Find hex or decimal numbers
-        nums = re.findall(r'(?:0x[0-9a-fA-F]+)|(?:\b-?\d+\b)', args_no_mem)
+        nums = self.NUMBER.findall(args_no_mem)
         if nums:
             val_str = nums[-1]
             try:
@@ -109,343 +1160,2038 @@ class AssemblyAnalyzer:
                 pass
         return None
 
-    def _scan_block_for_reg(self, block, reg_pattern):
+    # === Heuristics for Instruction Classification ===
+    # Instructions that WRITE to register (we can potentially get value from them)
+    WRITE_MNEMS = (
+        'mov', 'mvn', 'add', 'sub', 'li', 'la', 'or', 'and', 'eor', 'xor', 
+        'lsl', 'lsr', 'asr', 'ror', 'clr', 'move'
+    )
+    # Instructions that READ register (value doesn't change, keep looking back)
+    READ_MNEMS = (
+        'cmp', 'cmn', 'tst', 'teq', 'str', 'push', 'beq', 'bne', 'sw', 'sd', 
+        'st', 'std', 'test', 'sh', 'sb'
+    )
+    # Instructions that DESTROY register content (load from memory/stack -> unknown value for static analysis)
+    DESTRUCTIVE_MNEMS = (
+        'ldr', 'pop', 'ldm', 'lw', 'ld', 'lh', 'lb', 'lbu', 'lhu'
+    )
+    # Non-terminator mnemonics that still branch to a label (besides b*/j*)
+    BRANCH_MNEMS = {'cbz', 'cbnz', 'tbz', 'tbnz', 'loop', 'loope', 'loopne'}
+
+    def _mnem_kind(self, mnem):
+        """Heuristic class of a mnemonic below, checked in _reg_effect's order."""
+        if any(dm in mnem for dm in self.DESTRUCTIVE_MNEMS): return 'destructive'
+        if any(wm in mnem for wm in self.WRITE_MNEMS): return 'write'
+        if any(rm in mnem for rm in self.READ_MNEMS): return 'read'
+        return 'other'
+
+    def _reg_effect(self, mnem, args):
         """
-        Backtracking to find register load with smart instruction classification.
-        Returns the value if found, '?' if lost (destructive op), or None if not found in block.
+        Effect of one plain instruction on the syscall register: the loaded
+        value, '?' if the value is lost (destructive op / non-immediate
+        write), or None if the register is untouched.
         """
-        reg_regex = re.compile(r'\b' + reg_pattern + r'\b')
+        # Clean args for regex match (remove register prefixes like $ or %)
+        prefix = self.spec['reg_prefix']
+        clean_args = args.replace(prefix, '') if prefix else args
+        if not self._reg_regex.search(clean_args): return None
+        kind = self._mnem_kinds.get(mnem)
+        if kind is None:
+            kind = self._mnem_kinds[mnem] = self._mnem_kind(mnem)
 
-        # === Heuristics for Instruction Classification ===
-        # Instructions that WRITE to register (we can potentially get value from them)
-        write_mnems = {
-            'mov', 'mvn', 'add', 'sub', 'li', 'la', 'or', 'and', 'eor', 'xor', 
-            'lsl', 'lsr', 'asr', 'ror', 'clr', 'move'
-        }
-        # Instructions that READ register (value doesn't change, keep looking back)
-        read_mnems = {
-            'cmp', 'cmn', 'tst', 'teq', 'str', 'push', 'beq', 'bne', 'sw', 'sd', 
-            'st', 'std', 'test', 'sh', 'sb'
-        }
-        # Instructions that DESTROY register content (load from memory/stack -> unknown value for static analysis)
-        destructive_mnems = {
-            'ldr', 'pop', 'ldm', 'lw', 'ld', 'lh', 'lb', 'lbu', 'lhu'
-        }
+        # 1. Destructive Op: value comes from memory/stack. Logic ends.
+        if kind == 'destructive':
+            return '?'
 
-        for i in range(len(block) - 1, -1, -1):
-            instr = block[i]
-            if instr['type'] != 'instr': continue
-            
-            mnem = instr['mnem'] # Already lowercased in _parse_file
-            args = instr['args']
-            
-            # Clean args for regex match (remove register prefixes like $ or %)
-            clean_args = args.replace('$', '').replace('%', '')
-            
-            if reg_regex.search(clean_args):
-                # 1. Destructive Op: value comes from memory/stack. Logic ends.
-                if any(dm in mnem for dm in destructive_mnems):
-                    return '?'
-
-                # 2. Write Op: try to extract immediate
-                if any(wm in mnem for wm in write_mnems):
-                    val = self._extract_immediate(args)
-                    if val:
-                        # Edge case: mov r7, r7 (no info)
-                        if val == reg_pattern.replace('[xw]', '').replace('r', ''):
-                             continue
-                        return val
-                    # Write happened but no immediate (e.g., mov r0, r1) -> Value Unknown
-                    return '?'
-
-                # 3. Read Op: Instruction uses reg but doesn't change it. Continue back.
-                if any(rm in mnem for rm in read_mnems):
-                    continue
+        # 2. Write Op: try to extract immediate
+        if kind == 'write':
+            val = self._extract_immediate(args)
+            if val:
+                # Edge case: mov r7, r7 (no info)
+                if val == self._reg_self_val:
+                    return None
+                return val
+            # Write happened but no immediate (e.g., mov r0, r1) -> Value Unknown
+            return '?'
 
-                # 4. Fallback: Unknown instruction using the register.
-                # Assume it modifies the register. Try to extract immediate just in case.
-                val = self._extract_immediate(args)
-                if val:
-                     if val == reg_pattern.replace('[xw]', '').replace('r', ''):
-                         continue
-                     return val
-                
-                return '?' 
-        return None
+        # 3. Read Op: Instruction uses reg but doesn't change it.
+        if kind == 'read':
+            return None
+
+        # 4. Fallback: Unknown instruction using the register.
+        # Assume it modifies the register. Try to extract immediate just in case.
+        val = self._extract_immediate(args)
+        if val:
+            if val == self._reg_self_val:
+                return None
+            return val
+        return '?'
 
-    def _resolve_syscall_val(self, current_label, reg_name, instr_args=""):
+    def _summarize_block(self, block):
         """
-        Resolves the syscall number.
+        One forward pass over a block. Returns (exit, pending) where `exit` is
+        the register state the block leaves behind (None = passes its entry
+        state through) and `pending` lists the indexes of syscalls that still
+        need the block entry state. Syscalls that resolve locally get their
+        value assigned here.
+        """
+        state = None
+        pending = []
+        names = self.mnemonics.names
+        mnems = block.mnems
+        syscalls = block.syscalls
+        calls = block.calls
+        # Most blocks never name the register; one search over all operands rules that out
+        prefix = self.spec['reg_prefix']
+        text = '\n'.join([args for args in block.args if args])
+        touched = self._reg_regex.search(text.replace(prefix, '') if prefix else text) is not None
+        for idx, args in enumerate(block.args):
+            if idx in syscalls:
+                # 1. Immediate in instruction (e.g., svc 123), ignoring 0
+                direct_val = self._extract_immediate(args) if args else None
+                if direct_val and direct_val != '0':
+                    syscalls[idx] = direct_val
+                    self.syscall_outcomes['immediate'] += 1
+                # 2. Last write earlier in the same block
+                elif state is not None:
+                    syscalls[idx] = state
+                    self.syscall_outcomes['same_block'] += 1
+                else:
+                    pending.append(idx)
+                continue
+            if not touched or args is None or idx in calls: continue
+            effect = self._reg_effect(names[mnems[idx]], args)
+            if effect is not None:
+                state = effect
+        return state, pending
+
+    def _block_flow(self, block):
+        """(branch target labels, falls through) for one block."""
+        names = self.mnemonics.names
+        targets = []
+        for i, args in enumerate(block.args):
+            if args is None or '<' not in args or not block.is_plain(i): continue
+            mnem = names[block.mnems[i]]
+            if not (mnem[0] in 'bj' or mnem in self.BRANCH_MNEMS or mnem in self.spec['terminators']):
+                continue
+            tm = self._branch_pat.search(args)
+            if tm: targets.append(tm.group(1))
+
+        # Fall-through into the next label unless the block ends in a terminator
+        n = len(block)
+        falls = False
+        if n:
+            tail = range(max(0, n - 2) if self.spec['has_delay_slot'] else n - 1, n)
+            falls = all(block.args[i] is not None for i in tail) and \
+                not any(self._is_terminator(names[block.mnems[i]], block.args[i]) for i in tail)
+        return tuple(targets), falls
+
+    def _block_successors(self, idx, label_index):
+        """Labels control can reach after the block at label_order[idx]."""
+        block = self.raw_blocks[self.label_order[idx]]
+        if block.flow is None:
+            block.flow = self._block_flow(block)
+        targets, falls = block.flow
+        succs = [t for t in targets if t in label_index]
+        if falls and idx + 1 < len(self.label_order):
+            succs.append(self.label_order[idx + 1])
+        return succs
+
+    def _resolve_syscalls(self, labels=None):
+        """
+        Resolves every syscall number in one linear pass.
         Priority:
         1. Immediate inside the syscall instruction (e.g., svc 0x900000)
-        2. Backtracking in current block
-        3. Backtracking in immediate predecessor block (if connected)
-        """
-        # 1. Immediate in instruction (e.g., svc 123), ignoring 0
-        if instr_args:
-            direct_val = self._extract_immediate(instr_args)
-            if direct_val and direct_val != '0':
-                return direct_val
-
-        # 2. Scan current block
-        curr_block = self.raw_blocks.get(current_label, [])
-        val = self._scan_block_for_reg(curr_block, reg_name)
-        if val: return val
-        
-        # 3. Scan previous block (Linear sweep fallback)
-        try:
-            if not self.label_order: return '?'
-            curr_idx = self.label_order.index(current_label)
-            if curr_idx == 0: return '?'
-            
-            prev_label = self.label_order[curr_idx - 1]
-            prev_block = self.raw_blocks[prev_label]
-            if not prev_block: return '?'
-            
-            last_instr = prev_block[-1]
-            is_connected = False
-            
-            # Check connection: Fallthrough or explicit branch to current label
-            if 'mnem' in last_instr:
-                mnem = last_instr['mnem']
-                args = last_instr['args']
-                if current_label in args: is_connected = True
-                elif not self._is_terminator(mnem, args): is_connected = True
-            
-            if is_connected:
-                val = self._scan_block_for_reg(prev_block, reg_name)
-                if val: return val
-
-        except Exception:
-            pass
-        return '?'
+        2. Last write to the syscall register earlier in the same block
+        3. Register state at block entry, from a worklist dataflow pass over
+           the CFG (branch targets + fall-through). Predecessors that
+           disagree, or no predecessor at all, give '?'.
+        Block summaries are computed on demand and cached, so only blocks
+        that can flow into an unresolved syscall are ever scanned.
+        `labels` limits resolution to those blocks (default: all blocks
+        with syscalls). Under a budget, a syscall whose backward walk needs
+        more than `max_steps` blocks, and every pending one once time or
+        memory runs out, is left as '?'.
+        """
+        if labels is None: labels = self._syscall_blocks
+        if not labels: return
 
-    def _parse_file(self):
+        def summary(label):
+            block = self._relex(label) if label in self._stale_operands else self.raw_blocks[label]
+            if block.summary is None:
+                block.summary = self._summarize_block(block)
+            return block.summary
+
+        pending = {}
+        for label in labels:
+            waiting = summary(label)[1]
+            if waiting: pending[label] = waiting
+        if not pending: return
+        budget = self.budget
+        # Out of time or memory already: no region walk at all
+        stopped = budget is not None and budget.check()
+
+        if stopped:
+            preds_of = None
+        elif self._index is None:
+            label_index = {label: i for i, label in enumerate(self.label_order)}
+            preds = {}
+            for idx, label in enumerate(self.label_order):
+                for succ in self._block_successors(idx, label_index):
+                    preds.setdefault(succ, []).append(label)
+            preds_of = lambda label: preds.get(label, ())
+        else:
+            preds_of = self._lazy_preds
+
+        # Region that can influence a pending syscall: walk predecessors
+        # backwards, stopping at blocks that overwrite the register.
+        max_steps = budget.max_steps if budget is not None else None
+        if stopped:
+            region = set()
+        elif max_steps is None:
+            region = set(pending)
+            stack = list(pending)
+            steps = 0
+            while stack:
+                steps += 1
+                if budget is not None and not steps & 4095 and budget.check():
+                    stopped = True
+                    break
+                for p in preds_of(stack.pop()):
+                    if p not in region:
+                        region.add(p)
+                        if summary(p)[0] is None: stack.append(p)
+        else:
+            # Every syscall walks on its own, through blocks no finished walk
+            # has covered yet; one that runs out of steps stays unresolved
+            region = set()
+            for n, label in enumerate(list(pending)):
+                if not n & 255 and budget.check():
+                    stopped = True
+                    break
+                seen = {label}
+                stack = [label]
+                steps = 0
+                while stack and steps < max_steps:
+                    steps += 1
+                    for p in preds_of(stack.pop()):
+                        if p not in seen and p not in region:
+                            seen.add(p)
+                            if summary(p)[0] is None: stack.append(p)
+                if stack:
+                    budget.exceed(f"syscall backtracking limit of {max_steps} blocks reached")
+                    waiting = pending.pop(label)
+                    self.syscall_outcomes['unknown'] += len(waiting)
+                    syscalls = self.raw_blocks[label].syscalls
+                    for idx in waiting:
+                        syscalls[idx] = '?'
+                else:
+                    region |= seen
+
+        # Worklist over the region: state lattice None (no info yet) > value > '?'
+        out = {label: summary(label)[0] for label in region}
+        succs_of = {}
+        for label in region:
+            for p in preds_of(label):
+                succs_of.setdefault(p, []).append(label)
+
+        def entry_state(label):
+            # Nothing flows into entry points: the caller's value is unknown
+            ps = preds_of(label)
+            if not ps: return '?'
+            state = None
+            for p in ps:
+                val = out[p]
+                if val is None: continue
+                if state is None: state = val
+                elif state != val: return '?'
+            return state
+
+        transparent = [label for label in region if summary(label)[0] is None] if not stopped else []
+        work = deque(transparent)
+        queued = set(transparent)
+        visits = 0
+        while work:
+            if budget is not None and visits and not visits & 4095 and budget.check():
+                stopped = True
+                break
+            label = work.popleft()
+            queued.discard(label)
+            visits += 1
+            new = entry_state(label)
+            if new != out[label]:
+                out[label] = new
+                for s in succs_of.get(label, ()):
+                    if summary(s)[0] is None and s not in queued:
+                        queued.add(s)
+                        work.append(s)
+
+        self.search_counts['dataflow_region'] += len(region)
+        self.search_counts['dataflow_visits'] += visits
+
+        for label, waiting in pending.items():
+            # A dataflow pass cut short has no fixpoint to read
+            val = '?' if stopped else entry_state(label) or '?'
+            self.syscall_outcomes['unknown' if val == '?' else 'predecessor'] += len(waiting)
+            syscalls = self.raw_blocks[label].syscalls
+            for idx in waiting:
+                syscalls[idx] = val
+
+    # ==========================================
+    #  Streaming Input Pipeline
+    # ==========================================
+    def _open_input(self):
+        """Opens the dump as a binary stream. '-' means stdin (pipe)."""
+        if self._opener is not None:
+            return self._opener()
+        if self.filepath == '-':
+            return sys.stdin.buffer
         try:
-            with open(self.filepath, 'r', encoding='utf-8', errors='replace') as f:
-                lines = f.readlines()
+            stream = open(self.filepath, 'rb')
         except FileNotFoundError:
             print(f"Error: File {self.filepath} not found.")
             sys.exit(1)
+        if self._shard is not None:
+            stream.seek(self._shard[0])
+        return stream
+
+    def _iter_chunks(self, stream):
+        """
+        Yields raw byte chunks of at most READ_CHUNK bytes. read1() returns
+        whatever a pipe has available, so parsing keeps pace with the writer.
+        Under a budget, the input ends early when time or memory runs out,
+        or after the last line the line limit allows.
+        """
+        read = getattr(stream, 'read1', stream.read)
+        hasher = self._hasher
+        tee = self._tee
+        budget = self.budget
+        lines_left = budget.max_lines if budget is not None and budget.max_lines is not None else -1
+        left = self._shard[1] - self._shard[0] if self._shard is not None else -1
+        while left:
+            chunk = read(READ_CHUNK if left < 0 else min(left, READ_CHUNK))
+            if not chunk:
+                return
+            if left > 0: left -= len(chunk)
+            if budget is not None:
+                if budget.check(): return
+                if lines_left >= 0:
+                    n = chunk.count(b'\n')
+                    if n > lines_left or (n == lines_left and chunk[-1:] != b'\n'):
+                        end = -1
+                        for _ in range(lines_left):
+                            end = chunk.find(b'\n', end + 1)
+                        chunk = chunk[:end + 1]
+                        left = 0
+                        budget.exceed(f"line limit of {budget.max_lines} reached")
+                        if not chunk: return
+                    lines_left -= n
+            if hasher is not None: hasher.update(chunk)
+            if tee is not None: tee.write(chunk)
+            yield chunk
 
+    def _iter_lines(self, chunks):
+        """
+        Decodes byte chunks and yields stripped lines one at a time.
+        Only the unfinished line is kept between iterations, as a list of
+        pieces joined once it ends, so a huge line costs linear time.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        counts = self.line_counts
+        tail = []
+        for chunk in chunks:
+            text = decoder.decode(chunk)
+            if '\n' not in text:
+                if text: tail.append(text)
+                continue
+            lines = text.split('\n')
+            if tail:
+                tail.append(lines[0])
+                lines[0] = ''.join(tail)
+            last = lines.pop()
+            tail = [last] if last else []
+            counts['total'] += len(lines)
+            for line in lines:
+                yield line.strip()
+        tail.append(decoder.decode(b'', final=True))
+        tail = ''.join(tail)
+        if tail:
+            counts['total'] += 1
+            yield tail.strip()
+
+    def _iter_blocks(self, lines, targets=None):
+        """
+        Groups lines into labelled blocks and yields (label, block) as soon as
+        the next label (or EOF, or a None line) closes the block. Only the
+        block under construction is held here. Relocation targets are added
+        to `targets` (default: identified_funcs).
+
+        Lines are classified structurally first: labels end in '>:',
+        objdump separates address, bytes and instruction text with tabs, and
+        relocations carry 'R_' after the address. Regexes only run on
+        labels, relocations and lines that don't fit the tab layout.
+        """
+        spec = self.spec
         # Regex Patterns
-        label_pat = re.compile(r'^[0-9a-fA-F]*\s*<([^>]+)>:$')
-        # Instruction pattern: Address: HexBytes... Mnemonic Args
-        instr_pat = re.compile(r'^\s*[0-9a-fA-F]+:\s+(?:[0-9a-fA-F]{2,16}\s+)+\s+([a-z0-9._]+)\s*(.*)$')
+        label_pat = re.compile(r'^([0-9a-fA-F]*)\s*<([^>]+)>:$')
+        # Fallback for space-separated dumps: Address: HexBytes  Mnemonic Args.
+        # Byte groups are single-space separated and end at a tab or 2+ spaces,
+        # so hex-looking mnemonics/operands (add, 0x14) are never taken as bytes.
+        instr_pat = re.compile(r'^[0-9a-fA-F]+:\s+(?:[0-9a-fA-F]{2,16} )*[0-9a-fA-F]{2,16}(?:\t|\s\s)\s*'
+                               r'([a-z0-9._]+)\s*(.*)$')
+        mnem_ok = re.compile(r'[a-z0-9._]+\Z').match
         reloc_pat = re.compile(r'^\s*[0-9a-fA-F]+:\s+R_[\w_]+\s+(\S+)')
         target_pat = re.compile(r'<([^>+]+)(?:\+0x[0-9a-fA-F]+)?>')
+        hexdigits = '0123456789abcdefABCDEF'
 
+        call_mnems = spec['call']
+        syscall_mnems = spec['syscall']
+        nop_rules = spec['nop_rules']
+        mnem_ids = self.mnemonics.ids
+        intern_mnem = self.mnemonics.intern
+        intern_sym = self.symbols.intern
+        call_id = intern_mnem('call')
+
+        if targets is None: targets = self.identified_funcs
         current_label = None
-        is_dead = False
-        delay_slot = 0
+        block = None
+        block_mnems = block_args = None
+        # NOP rule results per (mnemonic, operands); padding repeats verbatim
+        nop_memo = {}
+        # Line tallies, kept in locals on the hot path
+        n_entries = n_reloc = n_reloc_only = n_directive = n_nop = 0
 
+        counts = self.line_counts
         for line in lines:
-            line = line.strip()
+            if not line:
+                # None ends a section fed by _iter_incremental, which reads
+                # the section's line tallies, so they are flushed first
+                if line is None and current_label is not None:
+                    n_entries += len(block)
+                    counts['instruction'] += n_entries - n_reloc_only
+                    counts['reloc'] += n_reloc
+                    counts['directive'] += n_directive
+                    counts['filtered_nop'] += n_nop
+                    n_entries = n_reloc = n_reloc_only = n_directive = n_nop = 0
+                    yield current_label, block
+                    current_label = None
+                continue
 
             # 1. Label Detection
-            label_match = label_pat.match(line)
-            if label_match:
-                current_label = label_match.group(1)
-                self.label_order.append(current_label)
-                self.raw_blocks[current_label] = []
-                is_dead = False
-                delay_slot = 0
+            if line[-1] == ':':
+                label_match = label_pat.match(line) if line[-2:] == '>:' else None
+                if label_match:
+                    if current_label is not None:
+                        n_entries += len(block)
+                        yield current_label, block
+                    addr, current_label = label_match.groups()
+                    if addr: self.label_addrs[current_label] = int(addr, 16)
+                    block = Block()
+                    block_mnems, block_args = block.mnems, block.args
                 continue
 
-            if not current_label: continue
-            # Note: We don't skip if is_dead is True immediately, 
-            # because we might need to parse data/padding to keep block structure,
-            # but usually we just want instructions.
+            # Everything else we care about starts with "<hex address>:"
+            if current_label is None or line[0] not in hexdigits: continue
 
-            # 2. Relocation Parsing (Priority Logic)
-            reloc_match = reloc_pat.match(line)
-            if reloc_match:
-                raw_target = reloc_match.group(1)
-                target = raw_target.split('@')[0]
-                target = re.sub(r'[+-]0x[0-9a-fA-F]+$', '', target)
+            # 3a. Instruction fast path: "addr:\tbytes\tmnemonic args"
+            mnem = None
+            fields = line.split('\t', 2)
+            if len(fields) == 3 and fields[0][-1] == ':' and fields[1][:1] in hexdigits:
+                text = fields[2].split(None, 1)
+                if text:
+                    mnem = text[0]
+                    args = text[1] if len(text) > 1 else ''
+                    mnem_id = mnem_ids.get(mnem)
+                    if mnem_id is None and not mnem_ok(mnem):
+                        mnem = None
 
-                # FILTER: Don't treat section symbols or special objdump markers as functions
-                if target.startswith('.') or target.startswith('*') or target == 'ABS' or target == 'UND': 
-                    continue
-                
-                self.identified_funcs.add(target)
-                
-                # Patch the previous instruction to be a call
-                if self.raw_blocks[current_label]:
-                    last_entry = self.raw_blocks[current_label][-1]
-                    # Only patch if it was interpreted as an instruction or call
-                    if last_entry.get('type') in ['instr', 'call']:
-                        last_entry['type'] = 'call'
-                        last_entry['target'] = target
-                        last_entry['is_reloc'] = True 
+            if mnem is None:
+                colon = line.find(':')
+                if colon < 0: continue
+
+                # 2. Relocation Parsing (Priority Logic)
+                if line[colon + 1:].lstrip().startswith('R_'):
+                    reloc_match = reloc_pat.match(line)
+                    if not reloc_match: continue
+                    n_reloc += 1
+                    raw_target = reloc_match.group(1)
+                    target = raw_target.split('@')[0]
+                    target = re.sub(r'[+-]0x[0-9a-fA-F]+$', '', target)
+
+                    # FILTER: Don't treat section symbols or special objdump markers as functions
+                    if target.startswith('.') or target.startswith('*') or target == 'ABS' or target == 'UND': 
                         continue
+                    
+                    targets.add(target)
+                    
+                    # Patch the previous instruction to be a call
+                    if block:
+                        last = len(block) - 1
+                        # Only patch if it was interpreted as an instruction or call
+                        if last not in block.syscalls:
+                            block.calls[last] = intern_sym(target)
+                            continue
+                    
+                    # If no previous instruction (weird), just add as call
+                    block.calls[block.append(call_id, None)] = intern_sym(target)
+                    n_reloc_only += 1
+                    continue
+
+                # 3b. Instruction Parsing, any other layout
+                instr_match = instr_pat.match(line)
+                if not instr_match: continue
+                mnem, args = instr_match.groups()
+                mnem_id = mnem_ids.get(mnem)
+
+            # === CRITICAL FIX: FILTER DIRECTIVES ===
+            # Objdump often lists .word, .byte, .short in code sections.
+            # These are NOT instructions.
+            if mnem[0] == '.':
+                n_directive += 1
+                continue
+
+            # === FILTER: padding NOPs declared by the arch (MIPS sll 0,0,0) ===
+            if nop_rules and mnem in nop_rules:
+                key = (mnem, args)
+                is_nop = nop_memo.get(key)
+                if is_nop is None:
+                    is_nop = nop_memo[key] = OPERAND_RULES[nop_rules[mnem]](args, spec)
+                if is_nop:
+                    n_nop += 1
+                    continue
+
+            if mnem_id is None: mnem_id = intern_mnem(mnem)
+            # Inlined Block.append
+            block_mnems.append(mnem_id)
+            block_args.append(args)
+
+            # A. Detect Call (Tentative)
+            if mnem in call_mnems:
+                idx = len(block_args) - 1
+                target = None
+                if '<' in args:
+                    tm = target_pat.search(args)
+                    if tm: target = tm.group(1)
                 
-                # If no previous instruction (weird), just add as call
-                self.raw_blocks[current_label].append({'type': 'call', 'target': target, 'mnem': 'call', 'is_reloc': True})
+                # FILTER: Noise reduction
+                if target and not target.startswith('.') and not target.startswith('*') and target != 'ABS':
+                    block.calls[idx] = intern_sym(target)
+
+            # B. Detect Syscall
+            elif mnem in syscall_mnems:
+                block.syscalls[len(block_args) - 1] = None
+                self._syscall_blocks.add(current_label)
+
+        if current_label is not None:
+            n_entries += len(block)
+            yield current_label, block
+
+        counts['instruction'] += n_entries - n_reloc_only
+        counts['reloc'] += n_reloc
+        counts['directive'] += n_directive
+        counts['filtered_nop'] += n_nop
+
+    def _iter_sections(self, chunks):
+        """
+        Splits the raw byte stream at label lines and yields (label, label
+        line, body bytes) per section. Label candidates are found by a byte
+        search for '>:' and checked exactly as _iter_blocks checks a line,
+        so the split agrees with the lexer; bodies are never decoded here.
+        The open section and the unfinished line are kept as lists of
+        pieces and joined once, so huge sections or lines cost linear time.
+        """
+        label_pat = re.compile(r'^([0-9a-fA-F]*)\s*<([^>]+)>:$')
+        counts = self.line_counts
+        body = []           # pieces of the open section's body (nothing before the first label is kept)
+        partial = []        # pieces of the line the last chunk left unfinished
+        label = head = None
+
+        def match(raw):
+            line = raw.decode('utf-8', 'replace').strip()
+            label_match = label_pat.match(line) if line[-2:] == '>:' else None
+            if label_match:
+                addr, name = label_match.groups()
+                if addr: self.label_addrs[name] = int(addr, 16)
+                return name, line
+            return None
+
+        for chunk in chunks:
+            counts['total'] += chunk.count(b'\n')
+            first = chunk.find(b'\n')
+            if first < 0:
+                partial.append(chunk)
                 continue
+            # The line carried over from earlier chunks ends here
+            partial.append(chunk[:first])
+            line = b''.join(partial)
+            found = match(line) if b'>:' in line else None
+            if found:
+                if label is not None:
+                    yield label, head, b''.join(body)
+                label, head = found
+                body = []
+            elif label is not None:
+                body += (line, b'\n')
+            start = first + 1
+            last = chunk.rfind(b'\n')
+            scan = start
+            while True:
+                p = chunk.find(b'>:', scan, last)
+                if p < 0: break
+                end = chunk.find(b'\n', p)
+                scan = end
+                line_start = chunk.rfind(b'\n', 0, p) + 1
+                found = match(chunk[line_start:end])
+                if not found: continue
+                if label is not None:
+                    body.append(chunk[start:line_start])
+                    yield label, head, b''.join(body)
+                label, head = found
+                body = []
+                start = end + 1
+            if label is not None:
+                body.append(chunk[start:last + 1])
+            partial = [chunk[last + 1:]]
+        line = b''.join(partial)
+        if line:
+            counts['total'] += 1
+            found = match(line) if b'>:' in line else None
+            if found:
+                if label is not None:
+                    yield label, head, b''.join(body)
+                label, head = found
+                body = []
+            elif label is not None:
+                body.append(line)
+        if label is not None:
+            yield label, head, b''.join(body)
+
+    def _fingerprinter(self):
+        """
+        Returns a function mapping a section's text to (shape, operands).
+        `shape` leaves out what moves when other code changes size: the
+        address and byte columns, relocation offsets, "<addr> <sym>"
+        annotation addresses and %rip displacements. Columns are only cut
+        from lines _iter_blocks is sure to take its fast path on, which
+        never reads them. `operands` records what syscall resolution makes
+        of the lines that lost a value and name the syscall register or a
+        syscall, so blocks with equal shape and operands summarize equally.
+        All of it is regex substitution and str.split over the whole text.
+        """
+        spec = self.spec
+        words = '|'.join([spec['syscall_reg']] + [re.escape(m) for m in spec['syscall']])
+        operand_search = re.compile(r'\b(?:' + words + r')\b').search
+        prefix = spec['reg_prefix']
+        syscall_mnems = spec['syscall']
+        # "<addr>:\t<bytes>\t<mnemonic> ...", byte-only continuation lines and
+        # "<addr>: R_..."; \0 marks the cut
+        columns = re.compile(r'\n[ \t]*[0-9a-fA-F]+:\t(?:[0-9a-fA-F][^\t\n]*\t(?=[a-z0-9._]+(?:\s|$))'
+                             r'|(?:[0-9a-fA-F]{2} )*[0-9a-fA-F]{2}[ \t]*(?=\n|$))')
+        reloc_offset = re.compile(r'\n[ \t]*[0-9a-fA-F]+:(?=[ \t]+R_)')
+        hexdigits = '0123456789abcdefABCDEF'
+        blake2b = hashlib.blake2b
+
+        def cut_address(part):
+            # "jal\t401000" before " <f>" -> "jal\t"
+            head = part.rstrip(hexdigits)
+            return head if len(head) < len(part) and head[-1:] in ' \t,#' else None
+
+        def cut_displacement(part):
+            # "lea -0x2edb" before "(%rip)" -> "lea "
+            head = part.rstrip(hexdigits)
+            if len(head) == len(part) or head[-2:] != '0x': return None
+            return head[:-3] if head[-3:-2] == '-' else head[:-2]
+
+        def operand(line):
+            # The value _summarize_block would read from this line
+            if line[:1] != '\0': return line
+            words = line[1:].split(None, 1)
+            args = words[1] if len(words) > 1 else ''
+            if words[0] in syscall_mnems:
+                return str(self._extract_immediate(args))
+            return str(self._reg_effect(words[0], args))
 
-            # 3. Instruction Parsing
-            instr_match = instr_pat.match(line)
-            if instr_match:
-                mnem = instr_match.group(1).lower() # Normalize to lowercase
-                args = instr_match.group(2)
+        def unmoved(text, sep, cut, operands):
+            parts = text.split(sep)
+            pos = 0
+            end = -1
+            for i in range(len(parts) - 1):
+                part = parts[i]
+                at = pos + len(part)
+                pos = at + len(sep)
+                head = cut(part)
+                if head is None: continue
+                parts[i] = head
+                if at > end:
+                    # First value cut from this line
+                    end = text.find('\n', at)
+                    if end < 0: end = len(text)
+                    line = text[text.rfind('\n', 0, at) + 1:end]
+                    if operand_search(line.replace(prefix, '') if prefix else line):
+                        operands.append(operand(line))
+            return sep.join(parts)
 
-                # === CRITICAL FIX: FILTER DIRECTIVES ===
-                # Objdump often lists .word, .byte, .short in code sections.
-                # These are NOT instructions.
-                if mnem.startswith('.'):
+        def fingerprint(section):
+            if '\0' in section:
+                # Kept verbatim; the leading \1 keeps it apart from normalized text
+                return blake2b(('\1' + section).encode(), digest_size=16).digest(), b''
+            text = columns.sub('\n\0', '\n' + section)
+            if 'R_' in text:
+                text = reloc_offset.sub('\n\0', text)
+            operands = []
+            if ' <' in text:
+                text = unmoved(text, ' <', cut_address, operands)
+            if '(%rip)' in text:
+                text = unmoved(text, '(%rip)', cut_displacement, operands)
+            return (blake2b(text.encode(), digest_size=16).digest(),
+                    blake2b('\n'.join(operands).encode(), digest_size=16).digest())
+        return fingerprint
+
+    def _iter_incremental(self, chunks):
+        """
+        Yields (label, block) like _iter_blocks, lexing only the sections
+        that neither the base analysis nor the summary store already has.
+        A base block is reused when its section is byte-identical or only
+        moved (same shape); one whose operand values moved is re-lexed
+        later, and only if syscall resolution reads it. Store hits are
+        rebuilt from their entries, and lexed sections become new entries.
+        """
+        base = self._base
+        old_sections = base._sections if base is not None else {}
+        old_blocks = base.raw_blocks if base is not None else {}
+        sections = self._sections
+        stale = self._stale_operands
+        counts = self.incremental_counts
+        store = self._store
+        line_counts = self.line_counts
+        tally_keys = ('instruction', 'reloc', 'directive', 'filtered_nop')
+        fingerprint = self._fingerprinter()
+        blake2b = hashlib.blake2b
+
+        def reuse(relocs, tally):
+            # What the lexer would have recorded for the section
+            self.identified_funcs.update(relocs)
+            for name, n in zip(tally_keys, tally):
+                line_counts[name] += n
+
+        # One lexer for all changed sections, fed a section at a time
+        queue = []
+        def feed():
+            while queue:
+                yield from queue.pop()
+                yield None
+        found = set()
+        lexer = self._iter_blocks(feed(), found)
+        for label, head, data in self._iter_sections(chunks):
+            # Fingerprints: (raw bytes, shape, operands, relocation targets, line tallies)
+            raw = None
+            old = old_sections.get(label)
+            if sections is not None or store is not None:
+                raw = blake2b(data, digest_size=16).digest()
+            if sections is not None:
+                counts['sections'] += 1
+                if old is not None and old[0] == raw:
+                    counts['sections_reused'] += 1
+                    sections[label] = old
+                    stale.pop(label, None)
+                    reuse(old[3], old[4])
+                    yield label, old_blocks[label]
                     continue
 
-                # === FILTER: MIPS NOP encoded as sll 0,0,0 ===
-                if self.arch_name in ['mips', 'mipsel'] and mnem == 'sll':
-                    # Remove comments first
-                    temp_args = args.split('#')[0]
-                    # Use Regex to strip ALL whitespace (tabs, spaces), and $
-                    # This handles "zero, \tzero, 0" correctly
-                    clean_args = re.sub(r'[\s$]', '', temp_args)
-                    parts = clean_args.split(',')
-                    
-                    zeros = {'0', 'zero', 'r0', '0x0'}
-                    # If we have 3 args and all are synonyms for zero, treat as NOP
-                    if len(parts) == 3 and all(p in zeros for p in parts):
-                        continue
+            text = None
+            known = None
+            if store is not None:
+                raw_key = store.raw_key(self.arch_name, raw)
+                known = store.alias(raw_key)
+            if known is not None:
+                key, shape, operands = known
+            else:
+                text = data.decode('utf-8', 'replace')
+                shape, operands = fingerprint(text)
+                if store is not None:
+                    key = store.key(self.arch_name, shape, operands)
+            if old is not None and old[1] == shape:
+                counts['sections_reused'] += 1
+                if old[2] == operands:
+                    sections[label] = (raw, shape, operands) + old[3:]
+                    stale.pop(label, None)
+                else:
+                    # The stored fingerprints keep describing the block's own text
+                    sections[label] = old
+                    stale[label] = ((raw, shape, operands) + old[3:], head, data)
+                reuse(old[3], old[4])
+                yield label, old_blocks[label]
+                continue
+            stale.pop(label, None)
 
-                if delay_slot > 0:
-                    delay_slot -= 1
-                    if delay_slot == 0: is_dead = True
-
-                self.raw_blocks[current_label].append({
-                    'type': 'instr', 
-                    'mnem': mnem, 
-                    'args': args,
-                    'is_reloc': False
-                })
-
-                # A. Detect Call (Tentative)
-                if mnem in self.spec['call']:
-                    target = None
-                    if '<' in args:
-                        tm = target_pat.search(args)
-                        if tm: target = tm.group(1)
-                    
-                    # FILTER: Noise reduction
-                    if target and not target.startswith('.') and not target.startswith('*') and target != 'ABS':
-                        self.raw_blocks[current_label][-1]['type'] = 'call'
-                        self.raw_blocks[current_label][-1]['target'] = target
-
-                # B. Detect Syscall
-                elif mnem in self.spec['syscall']:
-                    self.raw_blocks[current_label][-1]['type'] = 'syscall'
-                    val = self._resolve_syscall_val(current_label, self.spec['syscall_reg'], args)
-                    self.raw_blocks[current_label][-1]['syscall_val'] = val
-
-                # C. Detect Terminator
-                if self._is_terminator(mnem, args):
-                    if self.spec['has_delay_slot']:
-                        if delay_slot == 0: delay_slot = 1
-                    else:
-                        # For ARM/x86, we stop tracking "flow" strictly inside a block 
-                        # but we DON'T mark is_dead=True because in assembly (especially hand-written),
-                        # code might continue after a branch due to literal pools or multiple entry points.
-                        # We err on the side of Recall here.
-                        pass 
+            if store is not None:
+                if known is None:
+                    self._store_aliases[raw_key] = (key, shape, operands)
+                entry = store.load(key)
+                self.store_counts['lookups'] += 1
+                if entry is not None:
+                    self.store_counts['hits'] += 1
+                    if known is not None: self.store_counts['raw_hits'] += 1
+                    block = self._stored_block(entry)
+                    if block.syscalls: self._syscall_blocks.add(label)
+                    if sections is not None:
+                        sections[label] = (raw, shape, operands, entry[5], entry[6])
+                    reuse(entry[5], entry[6])
+                    yield label, block
+                    continue
+
+            if text is None:
+                # Aliased, but the entry's pack was evicted
+                text = data.decode('utf-8', 'replace')
+            before = [line_counts[name] for name in tally_keys]
+            queue.append([head] + [line.strip() for line in text.split('\n')])
+            label, block = next(lexer)
+            relocs = tuple(found)
+            tally = tuple(line_counts[name] - n for name, n in zip(tally_keys, before))
+            if store is not None:
+                self._store_new[key] = self._store_entry(block, relocs, tally)
+            if sections is not None:
+                sections[label] = (raw, shape, operands, relocs, tally)
+            self.identified_funcs |= found
+            found.clear()
+            yield label, block
+        # Let the lexer finish
+        for _ in lexer: pass
+
+    def _relex(self, label):
+        """Replaces a reused block whose operand values moved with a freshly lexed one."""
+        fingerprints, head, data = self._stale_operands.pop(label)
+        lines = [head] + [line.strip() for line in data.decode('utf-8', 'replace').split('\n')]
+        # The section's lines were already counted when it was reused
+        line_counts = dict(self.line_counts)
+        for label, block in self._iter_blocks(lines, set()):
+            self.raw_blocks[label] = block
+            self._sections[label] = fingerprints
+        self.line_counts = line_counts
+        return block
+
+    def _store_entry(self, block, relocs, tally):
+        """
+        SummaryStore form of a freshly lexed block: names instead of interned
+        ids, and only what later passes read (distinct mnemonics, calls,
+        locally resolved syscalls, flow and register summary).
+        """
+        if block.flow is None:
+            block.flow = self._block_flow(block)
+        if block.summary is None:
+            block.summary = self._summarize_block(block)
+        mnems = self.mnemonics.names
+        symbols = self.symbols.names
+        return (tuple(mnems[i] for i in set(block.mnems)),
+                tuple((idx, symbols[sym]) for idx, sym in block.calls.items()),
+                tuple(block.syscalls.items()),
+                block.flow,
+                (block.summary[0], tuple(block.summary[1])),
+                relocs, tally)
+
+    def _stored_block(self, entry):
+        """Block rebuilt from a SummaryStore entry; it keeps no operand text."""
+        mnems, calls, syscalls, flow, summary = entry[:5]
+        mnem_ids, intern_mnem = self.mnemonics.ids, self.mnemonics.intern
+        sym_ids, intern_sym = self.symbols.ids, self.symbols.intern
+        block = Block()
+        block.mnems.extend([mnem_ids[m] if m in mnem_ids else intern_mnem(m) for m in mnems])
+        block.calls = {idx: sym_ids[name] if name in sym_ids else intern_sym(name) for idx, name in calls}
+        block.syscalls = dict(syscalls)
+        block.flow = flow
+        block.summary = summary
+        return block
+
+    def _parse_file(self):
+        stream = self._open_input()
+        try:
+            chunks = self._iter_chunks(stream)
+            if self._sections is None and self._store is None:
+                blocks = self._iter_blocks(self._iter_lines(chunks))
+            else:
+                blocks = self._iter_incremental(chunks)
+            max_labels = self.budget.max_labels if self.budget is not None else None
+            for label, block in blocks:
+                if max_labels is not None and len(self.label_order) >= max_labels:
+                    self.budget.exceed(f"label limit of {max_labels} reached")
+                    # The lexer already noted the dropped block's syscalls
+                    if label not in self.raw_blocks: self._syscall_blocks.discard(label)
+                    break
+                self.label_order.append(label)
+                self.raw_blocks[label] = block
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        if self._base is not None:
+            # Reused blocks were lexed by the base; collect their syscalls here
+            self._syscall_blocks = {label for label, block in self.raw_blocks.items() if block.syscalls}
+
+    def _shard_bounds(self, jobs):
+        """
+        Offsets cutting the dump file into up to `jobs` byte ranges of about
+        equal size. Every cut is at the start of a line the lexer takes as a
+        label, so no block is split and no lexer state crosses a cut.
+        """
+        bounds = [0]
+        with open(self.filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size: return [0, 0]
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for k in range(1, jobs):
+                p = data.find(b'>:', size * k // jobs)
+                while p >= 0:
+                    end = data.find(b'\n', p)
+                    if end < 0: end = size
+                    line_start = data.rfind(b'\n', 0, p) + 1
+                    line = data[line_start:end].decode('utf-8', 'replace').strip()
+                    if line[-2:] == '>:' and DumpIndex.LABEL.match(line): break
+                    p = data.find(b'>:', end)
+                if p < 0: break
+                if line_start > bounds[-1]: bounds.append(line_start)
+        finally:
+            data.close()
+        bounds.append(size)
+        return bounds
+
+    def _parse_parallel(self, jobs):
+        """
+        Lexes the shards of the dump in a process pool and merges them in
+        file order. Each worker interns names in its own tables; merging the
+        tables shard by shard interns them in first-occurrence order, as a
+        serial parse does, so ids are remapped only where they differ.
+        """
+        import multiprocessing
+        bounds = self._shard_bounds(jobs)
+        self.shards = len(bounds) - 1
+        if self.shards < 2:
+            self._parse_file()
+            return
+        tasks = [(self.filepath, self.arch_name, start, end) for start, end in zip(bounds, bounds[1:])]
+        # Merging only allocates; cyclic GC passes over the growing heap would be pure overhead
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with multiprocessing.Pool(self.shards) as pool:
+                for shard in pool.imap(parse_shard, tasks):
+                    self._merge_shard(shard)
+        finally:
+            if collecting: gc.enable()
+
+    def _shard_state(self):
+        """
+        A worker's parse for _merge_shard. Blocks travel as a few flat
+        containers, which pickle far faster than Block objects. Operand
+        strings stay behind: flow and summary are all the parent reads
+        from them.
+        """
+        blocks = self.raw_blocks.values()
+        mnems = array('I')
+        for block in blocks:
+            mnems.extend(block.mnems)
+        return (self.label_order, list(self.raw_blocks), [len(block) for block in blocks], mnems,
+                [block.calls for block in blocks], [block.syscalls for block in blocks],
+                [block.flow for block in blocks], [block.summary for block in blocks],
+                self.mnemonics.names, self.symbols.names, self.identified_funcs, self.label_addrs,
+                self._syscall_blocks, self.line_counts, self.syscall_outcomes)
+
+    def _merge_shard(self, shard):
+        (labels, block_labels, sizes, mnems, calls, syscalls, flows, summaries,
+         mnemonics, symbols, identified, addrs, syscall_blocks, line_counts, outcomes) = shard
+        mnem_ids = [self.mnemonics.intern(name) for name in mnemonics]
+        sym_ids = [self.symbols.intern(name) for name in symbols]
+        if mnem_ids != list(range(len(mnem_ids))):
+            mnems = array('I', map(mnem_ids.__getitem__, mnems))
+        remap_syms = sym_ids != list(range(len(sym_ids)))
+        raw_blocks = self.raw_blocks
+        pos = 0
+        for label, n, block_calls, block_syscalls, flow, summary in zip(block_labels, sizes, calls, syscalls,
+                                                                        flows, summaries):
+            block = Block()
+            block.mnems = mnems[pos:pos + n]
+            pos += n
+            if remap_syms and block_calls:
+                block_calls = {idx: sym_ids[target] for idx, target in block_calls.items()}
+            block.calls = block_calls
+            block.syscalls = block_syscalls
+            block.flow = flow
+            block.summary = summary
+            # A label repeated in a later shard replaces the earlier block, as in a serial parse
+            raw_blocks[label] = block
+        self.label_order += labels
+        self.identified_funcs |= identified
+        self.label_addrs.update(addrs)
+        self._syscall_blocks |= syscall_blocks
+        for key, n in line_counts.items():
+            self.line_counts[key] += n
+        for key, n in outcomes.items():
+            self.syscall_outcomes[key] += n
 
     def _finalize_functions(self):
         """
         Promote call targets to identified functions ONLY if they weren't
         patched by a relocation (or if they are valid local calls).
         """
-        for label in self.raw_blocks:
-            for item in self.raw_blocks[label]:
-                if item.get('type') == 'call':
-                    target = item['target']
-                    # Final noise filter
-                    if not target.startswith('.') and not target.startswith('*') and target != 'ABS':
-                        self.identified_funcs.add(target)
+        names = self.symbols.names
+        for block in self.raw_blocks.values():
+            for target_id in block.calls.values():
+                target = names[target_id]
+                # Final noise filter
+                if not target.startswith('.') and not target.startswith('*') and target != 'ABS':
+                    self.identified_funcs.add(target)
+
+    def _in_scope(self, scope, label):
+        """ELF mode: does the symbol range of `scope` cover `label`?"""
+        addr = self.label_addrs.get(label)
+        if addr is None: return True
+        rng = self.elf_funcs.get(scope)
+        return rng is not None and rng[0] <= addr < rng[0] + rng[1]
 
     def _build_function_graph(self):
         current_scope = None
+        members = None
+        groups = {}
+        intern_sym = self.symbols.intern
         
         for label in self.label_order:
             # We treat every label as a potential function part, 
             # but we group them under the last seen "Identified Function".
-            if label in self.identified_funcs or current_scope is None:
+            if label in self.identified_funcs or current_scope is None or \
+               (self.elf_funcs is not None and not self._in_scope(current_scope, label)):
                 current_scope = label
-                if current_scope not in self.functions:
-                    self.functions[current_scope] = {
-                        'callees': set(), 
-                        'instrs': set(), 
-                        'syscalls': set()
-                    }
-            
-            for item in self.raw_blocks[label]:
-                if 'mnem' in item:
-                    self.functions[current_scope]['instrs'].add(item['mnem'])
-                
-                if item['type'] == 'call':
-                    self.functions[current_scope]['callees'].add(item['target'])
-                elif item['type'] == 'syscall':
-                    val = item['syscall_val']
-                    if val != 'unknown':
-                        self.functions[current_scope]['syscalls'].add(str(val))
-                    else:
-                        self.functions[current_scope]['syscalls'].add('?')
+                members = groups.get(current_scope)
+                if members is None:
+                    intern_sym(current_scope)
+                    members = groups[current_scope] = []
+            members.append(self.raw_blocks[label])
+
+        base = self._base
+        old_funcs = base.functions if base is not None else {}
+        old_blocks = base._func_blocks if base is not None else {}
+        changed = set()
+        for name, blocks in groups.items():
+            old = old_funcs.get(name)
+            prev = old_blocks.get(name)
+            # Same block objects and nothing resolved by dataflow: same summary
+            if old is not None and prev is not None and len(prev) == len(blocks) and \
+               all(a is b for a, b in zip(prev, blocks)) and \
+               not any(b.syscalls and b.summary[1] for b in blocks):
+                self.functions[name] = FunctionSummary(old.callees, old.instrs, old.syscalls)
+                self.incremental_counts['functions_reused'] += 1
+                continue
+            scope = self.functions[name] = self._summarize_function(blocks)
+            if old is None or (old.callees, old.instrs, old.syscalls) != \
+                    (scope.callees, scope.instrs, scope.syscalls):
+                changed.add(name)
+        if self._func_blocks is not None:
+            self._func_blocks = groups
+
+        if base is not None:
+            changed.update(name for name in old_funcs if name not in self.functions)
+            self.incremental_counts['functions_changed'] = len(changed)
+            if base._closure is not None:
+                self._base_closure = (base._closure, dict(base._memo))
+                self._changed = changed
+
+    def _summarize_function(self, blocks):
+        """Bitsets of one function from its member blocks."""
+        intern_sys = self.syscall_numbers.intern
+        scope = FunctionSummary()
+        for block in blocks:
+            instrs = 0
+            for mnem_id in set(block.mnems):
+                instrs |= 1 << mnem_id
+            scope.instrs |= instrs
+            for target_id in block.calls.values():
+                scope.callees |= 1 << target_id
+            for val in block.syscalls.values():
+                if val != 'unknown':
+                    scope.syscalls |= 1 << intern_sys(str(val))
+                else:
+                    scope.syscalls |= 1 << intern_sys('?')
+        return scope
+
+    # ==========================================
+    #  Lazy Analysis
+    # ==========================================
+    def _lazy_block(self, label):
+        """Lexes the (last) section of `label` on first use."""
+        block = self.raw_blocks.get(label)
+        if block is None:
+            index = self._index
+            for _, block in self._iter_blocks(index.lines(index.positions[label][-1]), set()):
+                pass
+            self.raw_blocks[label] = block
+            self.lazy_counts['sections_parsed'] += 1
+        return block
+
+    def _lazy_flow(self, label):
+        block = self._lazy_block(label)
+        if block.flow is None:
+            block.flow = self._block_flow(block)
+        return block.flow
+
+    def _starts_function(self, label):
+        """
+        Does full grouping open a function at `label`? Besides the known
+        names and relocation targets that is any label some block calls;
+        only the sections that mention the label are lexed to find out.
+        """
+        start = self._starts.get(label)
+        if start is None:
+            start = label in self.identified_funcs
+            if not start and not label.startswith('.') and not label.startswith('*') and label != 'ABS':
+                for caller in self._index.mentioning(label):
+                    calls = self._lazy_block(caller).calls
+                    if calls and self.symbols.ids.get(label) in calls.values():
+                        start = True
+                        break
+            self._starts[label] = start
+        return start
+
+    def _lazy_preds(self, label):
+        """Predecessors of `label`, as the full CFG would have them."""
+        preds = self._preds.get(label)
+        if preds is None:
+            order = self.label_order
+            preds = [order[i - 1] for i in self._index.positions[label]
+                     if i and self._lazy_flow(order[i - 1])[1]]
+            preds += [source for source in self._index.branching_to(label)
+                      if label in self._lazy_flow(source)[0]]
+            self._preds[label] = preds
+        return preds
+
+    def _lazy_function(self, func):
+        """
+        Builds the summary of `func` from its member blocks on first use.
+        Returns False if full grouping would not make `func` a function.
+        """
+        if func in self.functions: return True
+        positions = self._index.positions.get(func)
+        if positions is None: return False
+        with self.phase('lazy'):
+            order = self.label_order
+            members = []
+            for i in positions:
+                if i and not self._starts_function(func): continue
+                members.append(func)
+                i += 1
+                while i < len(order) and not self._starts_function(order[i]):
+                    members.append(order[i])
+                    i += 1
+            if not members: return False
+            blocks = [self._lazy_block(label) for label in members]
+            self._resolve_syscalls([label for label in dict.fromkeys(members)
+                                    if self.raw_blocks[label].syscalls and label not in self._resolved])
+            self._resolved.update(members)
+            self.symbols.intern(func)
+            self.functions[func] = self._summarize_function(blocks)
+            self.lazy_counts['functions_built'] += 1
+            # The closure is rebuilt over the larger graph on next use
+            self._closure = None
+        return True
+
+    def _lazy_reach(self, func):
+        """Builds every function reachable from `func`."""
+        if func in self._reached: return
+        budget = self.budget
+        stack = [func]
+        seen = {func}
+        while stack:
+            # Out of time or memory: answer from what is built, and try again next time
+            if budget is not None and budget.check(): return
+            name = stack.pop()
+            if not self._has_function(name): continue
+            for callee in self.symbols.decode(self.functions[name].callees):
+                if callee not in seen:
+                    seen.add(callee)
+                    stack.append(callee)
+        # Memoized answers stay valid: their functions' reach was already complete
+        self._reached.update(seen)
+
+    def _lazy_all(self):
+        """Builds every function, for queries that list them all."""
+        if self._complete: return
+        budget = self.budget
+        for label in dict.fromkeys(self.label_order):
+            if budget is not None and budget.check(): return
+            self._lazy_function(label)
+        self._reached.update(self.functions)
+        self._complete = True
+
+    def _has_function(self, func):
+        return func in self.functions or (self._index is not None and self._lazy_function(func))
+
+    def memory_estimate(self):
+        """
+        Rough size in bytes of everything this instance keeps alive, for
+        budgeting long-lived analyzers. The parsed blocks are measured once;
+        the closure part grows as recursive queries are answered.
+        """
+        if self._raw_size is None:
+            size = 0
+            for block in self.raw_blocks.values():
+                size += 250 + 68 * len(block) + 100 * (len(block.calls) + len(block.syscalls))
+                size += sum(len(a) for a in block.args if a is not None)
+            names = len(self.symbols.names) + len(self.mnemonics.names) + len(self.syscall_numbers.names)
+            size += 80 * names + len(self.functions) * (150 + names // 8)
+            if self._sections is not None:
+                # Three 16-byte digests and a tuple per section, block lists per function
+                size += 300 * len(self._sections) + 8 * len(self.raw_blocks) + 60 * len(self._func_blocks)
+            self._raw_size = size
+        size = self._raw_size
+        if self._closure is not None:
+            size += len(self._closure.reach) * (100 + 3 * len(self.symbols.names) // 8)
+        return size + 200 * len(self._memo)
 
     # Getters
     def get_all_functions(self):
+        if self._index is not None: self._lazy_all()
         return sorted(list(self.functions.keys()))
 
     def get_direct_callees(self, func):
-        if func not in self.functions: return []
-        return sorted(list(self.functions[func]['callees']))
+        if not self._has_function(func): return []
+        return sorted(self.symbols.decode(self.functions[func].callees))
+
+    def _build_closure(self):
+        with self.phase('closure'):
+            if self._base_closure is None:
+                closure = CallGraphClosure(self.functions, self.symbols, budget=self.budget)
+            else:
+                closure = CallGraphClosure(self.functions, self.symbols, self._base_closure[0], self._changed,
+                                           self.budget)
+        self.search_counts['closure_nodes'] = len(closure.comp_of)
+        self.search_counts['closure_edges'] = closure.edges
+        if closure.stale is not None:
+            # Answers the base gave for functions outside the stale region still hold
+            ids = self.symbols.ids
+            for key, res in self._base_closure[1].items():
+                if key[1] in self.functions and ids[key[1]] not in closure.stale:
+                    self._memo.setdefault(key, res)
+            self.incremental_counts['closure_recomputed'] = len(closure.stale)
+            closure.stale = self._base_closure = self._changed = None
+        self._closure = closure
+
+    def _recursive(self, kind, func):
+        """Memoized lookup into the transitive closure (built on first use)."""
+        key = (kind, func)
+        if self._index is not None: self._lazy_reach(func)
+        if self._closure is None:
+            self._build_closure()
+        res = self._memo.get(key)
+        if res is None:
+            table = {'callees': self.symbols, 'instructions': self.mnemonics,
+                     'syscall_values': self.syscall_numbers}[kind]
+            res = self._memo[key] = sorted(table.decode(getattr(self._closure, kind)(func)))
+        return list(res)
 
     def get_indirect_callees(self, func):
-        if func not in self.functions: return []
-        visited = set()
-        queue = deque([func])
-        result = set()
-        while queue:
-            curr = queue.popleft()
-            if curr in visited: continue
-            visited.add(curr)
-            if curr != func: result.add(curr)
-            if curr in self.functions:
-                for child in self.functions[curr]['callees']:
-                    if child == func: result.add(child)
-                    queue.append(child)
-        return sorted(list(result))
+        if not self._has_function(func): return []
+        return self._recursive('callees', func)
 
     def get_syscalls(self, func):
-        if func not in self.functions: return []
-        res = sorted(list(self.functions[func]['syscalls']))
+        if not self._has_function(func): return []
+        res = sorted(self.syscall_numbers.decode(self.functions[func].syscalls))
         return [r for r in res if r != '?'] + (['?'] if '?' in res else [])
 
     def get_direct_instrs(self, func):
-        if func not in self.functions: return []
-        return sorted(list(self.functions[func]['instrs']))
+        if not self._has_function(func): return []
+        return sorted(self.mnemonics.decode(self.functions[func].instrs))
 
     def get_indirect_instrs(self, func):
-        callees = self.get_indirect_callees(func)
-        all_instrs = set(self.get_direct_instrs(func))
-        for c in callees:
-            all_instrs.update(self.get_direct_instrs(c))
-        return sorted(list(all_instrs))
+        if not self._has_function(func): return []
+        return self._recursive('instructions', func)
 
     def get_indirect_syscalls(self, func):
-        callees = self.get_indirect_callees(func)
-        all_syscalls = set(self.get_syscalls(func))
-        for c in callees:
-            all_syscalls.update(self.get_syscalls(c))
-        res = sorted(list(all_syscalls))
+        if not self._has_function(func): return []
+        res = self._recursive('syscall_values', func)
         return [r for r in res if r != '?'] + (['?'] if '?' in res else [])
 
+    def function_bits(self, func, recursive=False):
+        """(callees, instructions, syscalls) bitsets of `func`, or None if it is not a function."""
+        if not self._has_function(func): return None
+        if not recursive:
+            f = self.functions[func]
+            return f.callees, f.instrs, f.syscalls
+        if self._index is not None: self._lazy_reach(func)
+        if self._closure is None: self._build_closure()
+        closure = self._closure
+        return closure.callees(func), closure.instructions(func), closure.syscall_values(func)
+
+def parse_shard(job):
+    """Pool worker for AssemblyAnalyzer._parse_parallel: lexes one byte range of a dump file."""
+    path, arch, start, end = job
+    return AssemblyAnalyzer(path, arch, shard=(start, end))._shard_state()
+
+# ==========================================
+#  Objdump Driver
+# ==========================================
+# Same layout and tags as scripts/build.sh: toolchains live in /opt/<tag>-lab
+LAB_BASE_DIR = "/opt"
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+TAG_ARCH = {
+    'amd64':   'x86',
+    'i386':    'x86',
+    'mips':    'mipsel',
+    'armv7':   'arm',
+    'aarch64': 'aarch64',
+    's390x':   's390x',
+    'riscv64': 'riscv64',
+}
+
+def resolve_tag(tag=None):
+    """CLI tag, then $LAB_ARCH, then native; native spellings map to 'amd64'."""
+    tag = (tag or os.environ.get('LAB_ARCH') or '').lower()
+    return 'amd64' if tag in ('', 'native', 'amd64', 'x86_64') else tag
+
+def find_objdump(tag):
+    """Locates the objdump that matches a lab toolchain tag, or None."""
+    if tag != 'amd64':
+        bin_dir = os.path.join(LAB_BASE_DIR, f"{tag}-lab", "bin")
+        found = sorted(glob.glob(os.path.join(bin_dir, "*-linux-*objdump")) or
+                       glob.glob(os.path.join(bin_dir, "*-objdump")))
+        if found: return found[0]
+        if os.environ.get('LAB_ARCH', '').lower() == tag and shutil.which('lab-objdump'):
+            return shutil.which('lab-objdump')
+        if tag != 'i386': return None
+    return shutil.which('objdump')
+
+class ObjdumpProcess:
+    """
+    Runs objdump as a child process and exposes its stdout as the dump
+    stream, so disassembly and parsing overlap through the pipe.
+    """
+    def __init__(self, tool, binary):
+        self.cmd = [tool, '-d', '-r', binary]
+        self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE)
+        try:
+            # A larger pipe means fewer producer/consumer switches
+            fcntl.fcntl(self.proc.stdout.fileno(), F_SETPIPE_SZ, READ_CHUNK)
+        except OSError:
+            pass
+        self.read1 = self.proc.stdout.read1
+        self.read = self.proc.stdout.read
+        self.returncode = None
+
+    def close(self):
+        self.proc.stdout.close()
+        self.returncode = self.proc.wait()
+
+def analyze_binary(binary, tag=None, arch=None, cache=None, save_dump=None, objdump=None, stats=None,
+                   incremental=False, base=None, store=None, budget=None):
+    """
+    Disassembles `binary` with the toolchain objdump for `tag` and parses
+    its output as it is produced. The cache is keyed by the binary itself,
+    so a warm run never starts objdump. Raises RuntimeError on failure.
+    """
+    tag = resolve_tag(tag)
+    arch = arch or TAG_ARCH.get(tag)
+    if arch is None:
+        raise RuntimeError(f"no analyzer support for tag '{tag}'")
+    tool = objdump or find_objdump(tag)
+    if tool is None:
+        raise RuntimeError(f"objdump for tag '{tag}' not found under {LAB_BASE_DIR}/{tag}-lab/bin")
+    if not os.path.isfile(binary):
+        raise RuntimeError(f"File {binary} not found.")
+
+    procs = []
+    def opener():
+        procs.append(ObjdumpProcess(tool, binary))
+        return procs[-1]
+
+    digest = f"objdump:{os.path.basename(tool)}:{file_digest(binary)}" if cache is not None else None
+    tee = open(save_dump, 'wb') if save_dump else None
+    try:
+        analyzer = AssemblyAnalyzer(binary, arch, cache=cache, opener=opener, digest=digest, tee=tee,
+                                    stats=stats, incremental=incremental, base=base, store=store, budget=budget)
+    finally:
+        if tee is not None: tee.close()
+    # Stopping early closes the pipe under objdump, which then dies of SIGPIPE
+    if procs and procs[0].returncode and analyzer.partial is None:
+        raise RuntimeError(f"{' '.join(procs[0].cmd)} exited with status {procs[0].returncode}")
+    return analyzer
+
+def open_analyzer(file=None, arch=None, elf=None, binary=None, tag=None, objdump=None,
+                  cache=None, save_dump=None, stats=None, incremental=False, base=None, store=None,
+                  lazy=False, parse_jobs=1, budget=None):
+    """Builds an analyzer from a dump, an ELF symbol table and/or a binary, as the CLI does."""
+    if binary:
+        if lazy: _mode_disabled('--lazy', ((True, '--binary'),))
+        if parse_jobs > 1: _mode_disabled('--parse-jobs', ((True, '--binary'),))
+        return analyze_binary(binary, tag, arch, cache, save_dump, objdump, stats, incremental, base, store,
+                              budget)
+    if elf and not arch:
+        with ElfFile(elf) as image:
+            arch = image.arch
+    return AssemblyAnalyzer(file, arch or 'mips', cache=cache, elf=elf, stats=stats,
+                            incremental=incremental, base=base, store=store, lazy=lazy, parse_jobs=parse_jobs,
+                            budget=budget)
+
+# ==========================================
+#  Queries
+# ==========================================
+# Query name -> (getter, takes FUNC). Names match the CLI flags without '--'.
+QUERIES = {
+    'dump-graph':              (None, False),
+    'list-funcs':              ('get_all_functions', False),
+    'list-callees':            ('get_direct_callees', True),
+    'list-callees-recursive':  ('get_indirect_callees', True),
+    'list-syscalls':           ('get_syscalls', True),
+    'list-syscalls-recursive': ('get_indirect_syscalls', True),
+    'list-instrs':             ('get_direct_instrs', True),
+    'list-instrs-recursive':   ('get_indirect_instrs', True),
+}
+
+def parse_query(text):
+    """
+    Parses 'KIND FUNC', 'KIND=FUNC' or 'KIND' into a (kind, func) tuple.
+    A leading '--' is accepted so lines can be copied from CLI invocations.
+    """
+    text = text.strip()
+    if text.startswith('--'): text = text[2:]
+    kind, _, func = text.replace('=', ' ', 1).partition(' ')
+    func = func.strip() or None
+    if kind not in QUERIES:
+        raise ValueError(f"unknown query '{kind}'")
+    if QUERIES[kind][1] and not func:
+        raise ValueError(f"query '{kind}' requires a function name")
+    return kind, func
+
+def read_query_file(path):
+    """Reads one query per line; blank lines and '#' comments are skipped."""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        return [parse_query(line) for line in f
+                if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if f is not sys.stdin: f.close()
+
+def run_query(analyzer, kind, func=None):
+    """Answers a single query and returns a JSON-serialisable result."""
+    if kind == 'dump-graph':
+        return {f: {'callees': analyzer.get_direct_callees(f),
+                    'syscalls': analyzer.get_syscalls(f)}
+                for f in analyzer.get_all_functions()}
+    getter, takes_func = QUERIES[kind]
+    if takes_func:
+        return getattr(analyzer, getter)(func)
+    return getattr(analyzer, getter)()
+
+def run_batch(analyzer, queries, policy=None):
+    """Answers every (kind, func) query against one analyzer instance, then checks `policy`."""
+    doc = {
+        'file': analyzer.filepath or analyzer.elf_path,
+        'arch': analyzer.arch_name,
+        'results': [{'query': kind, 'func': func, 'result': run_query(analyzer, kind, func)}
+                    for kind, func in queries],
+    }
+    if policy is not None:
+        doc['policy'] = policy.check(analyzer)
+    if analyzer.partial is not None:
+        doc['partial'] = True
+        doc['partial_reason'] = analyzer.partial
+    return doc
+
+def print_query(analyzer, kind, func=None):
+    """Prints a query result in the classic plain-text format."""
+    print_result(kind, run_query(analyzer, kind, func))
+
+def print_result(kind, result):
+    """Prints a run_query() result (possibly decoded from JSON) like the classic CLI."""
+    if kind == 'dump-graph':
+        for func, node in result.items():
+            callees = node['callees']
+            sys_list = node['syscalls']
+            tag = f" [syscall: {','.join(sys_list)}]" if sys_list else ""
+            if callees:
+                print(f"{func}{tag} -> {', '.join(callees)}")
+            else:
+                print(f"{func}{tag} (no calls)")
+    elif kind == 'list-funcs':
+        print("\n".join(result))
+    else:
+        print(" ".join(result))
+
+# ==========================================
+#  Grading Policies
+# ==========================================
+# A policy file is a JSON object {"rules": [RULE, ...]}. A rule names the
+# functions it applies to and constrains their callees, instructions or
+# syscall numbers:
+#   {"id": "no-muldiv", "func": "main", "deny": {"instrs": ["mul*", "div*"]}}
+#   {"id": "io-only", "func": "main", "allow": {"syscalls": [1, 4, 10]}}
+#   {"id": "uses-y", "func": "x", "require": {"callees": ["y"]}, "recursive": false}
+# `func` is a name, a list of names or "*" (every function). Rules are
+# recursive unless "recursive" is false, i.e. they look at everything
+# reachable through calls. Names may be shell-style globs.
+POLICY_CHECKS = ('deny', 'allow', 'require')
+POLICY_KINDS = ('callees', 'instrs', 'syscalls')
+
+class Policy:
+    """
+    A validated policy. check() compiles every name list into a bitset over
+    the analyzer's interned ids, then evaluates all rules with one bitwise
+    operation per rule and function; only violations cost more, for their
+    witness call paths.
+    """
+    def __init__(self, doc):
+        self.doc = doc
+        rules = doc.get('rules') if isinstance(doc, dict) else None
+        if not isinstance(rules, list):
+            raise ValueError("policy: expected an object with a 'rules' list")
+        self.rules = []
+        for n, rule in enumerate(rules, 1):
+            where = f"policy: rule {n}"
+            if not isinstance(rule, dict):
+                raise ValueError(f"{where}: expected an object")
+            unknown = set(rule) - {'id', 'func', 'recursive', *POLICY_CHECKS}
+            if unknown:
+                raise ValueError(f"{where}: unknown field '{sorted(unknown)[0]}'")
+            funcs = rule.get('func')
+            if isinstance(funcs, str): funcs = [funcs]
+            if not funcs or not isinstance(funcs, list) or not all(isinstance(f, str) for f in funcs):
+                raise ValueError(f"{where}: 'func' must be a name, a list of names or \"*\"")
+            checks = []
+            for check in POLICY_CHECKS:
+                spec = rule.get(check, {})
+                if not isinstance(spec, dict):
+                    raise ValueError(f"{where}: '{check}' must map {', '.join(POLICY_KINDS)} to lists")
+                for kind, items in spec.items():
+                    if kind not in POLICY_KINDS:
+                        raise ValueError(f"{where}: unknown kind '{kind}' (expected {', '.join(POLICY_KINDS)})")
+                    if not isinstance(items, list) or not all(isinstance(i, (str, int)) for i in items):
+                        raise ValueError(f"{where}: '{check}.{kind}' must be a list of names")
+                    checks.append((check, kind, [self._normalize(kind, i) for i in items]))
+            if not checks:
+                raise ValueError(f"{where}: no deny/allow/require constraint")
+            self.rules.append((str(rule.get('id', f"rule-{n}")), funcs, rule.get('recursive', True) is not False,
+                               checks))
+
+    @staticmethod
+    def _normalize(kind, item):
+        """Syscall numbers are compared the way the analyzer prints them (decimal)."""
+        if kind == 'syscalls':
+            try:
+                return str(item if isinstance(item, int) else int(item, 0))
+            except ValueError:
+                pass
+        return str(item)
+
+    @classmethod
+    def load(cls, path):
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        try:
+            doc = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"policy: {path}: {e}")
+        finally:
+            if f is not sys.stdin: f.close()
+        return cls(doc)
+
+    @staticmethod
+    def _masks(table, items):
+        """One bitset per item; globs cover every matching name, unknown names nothing."""
+        masks = []
+        for item in items:
+            # A lone '?' is the unresolved syscall, not a pattern
+            if item != '?' and any(c in item for c in '*?['):
+                mask = 0
+                for i, name in enumerate(table.names):
+                    if fnmatch.fnmatchcase(name, item): mask |= 1 << i
+            else:
+                i = table.ids.get(item)
+                mask = 0 if i is None else 1 << i
+            masks.append(mask)
+        return masks
+
+    def check(self, analyzer):
+        """Evaluates every rule against `analyzer` and returns a JSON-serialisable report."""
+        # Bitsets per (function, recursive) first: in lazy mode this is what
+        # builds the functions, and it may intern names the masks must see
+        everything = None
+        targets = []
+        bits = {}
+        for rule_id, funcs, recursive, checks in self.rules:
+            if '*' in funcs:
+                if everything is None: everything = analyzer.get_all_functions()
+                names = everything
+            else:
+                names = funcs
+            for func in names:
+                if (func, recursive) not in bits:
+                    bits[func, recursive] = analyzer.function_bits(func, recursive)
+            targets.append(names)
+
+        tables = {'callees': analyzer.symbols, 'instrs': analyzer.mnemonics,
+                  'syscalls': analyzer.syscall_numbers}
+        slot = {kind: i for i, kind in enumerate(POLICY_KINDS)}
+        violations = []
+        witnesses = {}
+        evaluated = 0
+        for (rule_id, funcs, recursive, checks), names in zip(self.rules, targets):
+            compiled = []
+            for check, kind, items in checks:
+                masks = self._masks(tables[kind], items)
+                combined = 0
+                for mask in masks: combined |= mask
+                compiled.append((check, kind, items, masks, combined))
+            for func in names:
+                have = bits[func, recursive]
+                if have is None:
+                    violations.append({'rule': rule_id, 'func': func, 'check': 'exists',
+                                       'error': 'no such function'})
+                    continue
+                for check, kind, items, masks, combined in compiled:
+                    evaluated += 1
+                    present = have[slot[kind]]
+                    if check == 'require':
+                        missing = [item for item, mask in zip(items, masks) if not present & mask]
+                        if missing:
+                            violations.append({'rule': rule_id, 'func': func, 'check': check, 'kind': kind,
+                                               'items': [{'item': item} for item in missing]})
+                        continue
+                    bad = present & combined if check == 'deny' else present & ~combined
+                    if bad:
+                        paths = self._witnesses(analyzer, func, kind, bad, recursive, witnesses)
+                        violations.append({'rule': rule_id, 'func': func, 'check': check, 'kind': kind,
+                                           'items': [{'item': tables[kind].names[i], 'path': paths[i]}
+                                                     for i in iter_bits(bad)]})
+        return {'ok': not violations, 'rules': len(self.rules), 'checks': evaluated, 'violations': violations}
+
+    @staticmethod
+    def _call_tree(analyzer, func, recursive):
+        """
+        Functions reachable from `func` in breadth-first order, with the
+        caller each was first reached from. The walk is resumable: it only
+        goes as far as the witnesses asked for so far needed.
+        """
+        functions = analyzer.functions
+        names = analyzer.symbols.names
+        parent = {func: None}
+        queue = deque([func])
+        while queue:
+            name = queue.popleft()
+            f = functions.get(name)
+            if f is None: continue
+            yield name, f, parent
+            if not recursive: return
+            for callee in iter_bits(f.callees):
+                callee = names[callee]
+                if callee not in parent:
+                    parent[callee] = name
+                    queue.append(callee)
+
+    def _witnesses(self, analyzer, func, kind, wanted, recursive, memo):
+        """
+        Shortest call path from `func` to a function that uses each bit of
+        `wanted` itself. For callees the callee ends the path. Walks and
+        paths are shared through `memo` by every rule of one check().
+        """
+        known = memo.setdefault((func, recursive, kind), {})
+        missing = wanted
+        for i in known:
+            missing &= ~(1 << i)
+        if not missing:
+            return known
+        walk = memo.get((func, recursive))
+        if walk is None:
+            walk = memo[func, recursive] = [[], self._call_tree(analyzer, func, recursive)]
+        seen, rest = walk
+        names = analyzer.symbols.names
+        n = 0
+        while missing:
+            if n == len(seen):
+                step = next(rest, None)
+                if step is None: break
+                seen.append(step)
+            name, f, parent = seen[n]
+            n += 1
+            hit = getattr(f, kind) & missing
+            if not hit: continue
+            path = []
+            node = name
+            while node is not None:
+                path.append(node)
+                node = parent[node]
+            path.reverse()
+            for i in iter_bits(hit):
+                known[i] = path + [names[i]] if kind == 'callees' else path
+            missing &= ~hit
+        return known
+
+# ==========================================
+#  Multi-Dump Grading
+# ==========================================
+# objdump "file format" names -> ARCH_CONFIG keys
+FORMAT_ARCH = (
+    ('littlemips', 'mipsel'), ('bigmips', 'mips'), ('mips', 'mips'),
+    ('x86-64', 'x86'), ('i386', 'x86'),
+    ('aarch64', 'aarch64'), ('arm', 'arm'),
+    ('s390', 's390x'),
+    ('riscv', 'riscv64'),
+)
+
+def detect_arch(path):
+    """Guesses --arch from the 'file format' header objdump writes, or None."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for _, line in zip(range(8), f):
+                if 'file format' in line:
+                    fmt = line.rsplit('file format', 1)[1].strip()
+                    for needle, arch in FORMAT_ARCH:
+                        if needle in fmt: return arch
+    except OSError:
+        pass
+    return None
+
+def read_manifest(path):
+    """Reads 'PATH [ARCH]' lines; relative paths are taken relative to the manifest."""
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split('#', 1)[0].split()
+            if not parts: continue
+            arch = parts[1] if len(parts) > 1 else None
+            if arch is not None and arch not in ARCH_CONFIG:
+                raise ValueError(f"{parts[0]}: unknown architecture '{arch}'")
+            jobs.append((os.path.join(base, parts[0]), arch))
+    return jobs
+
+# Pool workers keep their SummaryStore between dumps, so packs load once
+_worker_stores = {}
+
+def grade_one(job):
+    """
+    Pool worker: analyzes one dump and answers all queries. Every failure is
+    turned into an error record so one bad dump never aborts the batch.
+    """
+    path, arch, queries, cache_dir, cache_max, store_dir, store_max, with_stats, lazy, policy, limits = job
+    record = {'file': path, 'arch': arch}
+    try:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"File {path} not found.")
+        cache = AnalysisCache(cache_dir, cache_max) if cache_dir else None
+        store = None
+        if store_dir:
+            store = _worker_stores.get(store_dir)
+            if store is None:
+                store = _worker_stores[store_dir] = SummaryStore(store_dir, store_max)
+        stats = AnalysisStats() if with_stats else None
+        budget = AnalysisBudget(**limits) if limits else None
+        analyzer = AssemblyAnalyzer(path, arch, cache=cache, stats=stats, store=store, lazy=lazy, budget=budget)
+        record['ok'] = True
+        with analyzer.phase('queries'):
+            batch = run_batch(analyzer, queries, policy)
+        for key in ('results', 'policy', 'partial', 'partial_reason'):
+            if key in batch:
+                record[key] = batch[key]
+        if stats is not None:
+            record['stats'] = stats.report(analyzer)
+    except (Exception, SystemExit) as e:
+        record['ok'] = False
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+def grade_many(jobs, queries, out, workers=None, default_arch=None, cache_dir=None, cache_max=256 << 20,
+               stats=False, store_dir=None, store_max=256 << 20, lazy=False, policy=None, limits=None):
+    """
+    Fans dumps out over a process pool and writes one JSON line per dump to
+    `out` as soon as it finishes. Returns the number of failed dumps. With
+    `stats`, every record carries the dump's AnalysisStats report; with a
+    `policy`, its check report. `limits` are AnalysisBudget arguments applied
+    to every dump; a dump that runs out is flagged partial, not failed.
+    """
+    import multiprocessing
+    tasks = [(path, arch or default_arch or detect_arch(path) or 'mips', queries, cache_dir, cache_max,
+              store_dir, store_max, stats, lazy, policy, limits)
+             for path, arch in jobs]
+    failed = 0
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+    # Recycle workers periodically so memory from huge dumps is returned
+    with multiprocessing.Pool(workers, maxtasksperchild=32) as pool:
+        for record in pool.imap_unordered(grade_one, tasks, chunksize=1):
+            failed += not record['ok']
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    return failed
+
+def write_profile(profiler, path):
+    """Saves cProfile data to `path`, or prints the top entries to stderr for '-'."""
+    import pstats
+    if path == '-':
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(30)
+    else:
+        profiler.dump_stats(path)
+
+# ==========================================
+#  Analysis Daemon
+# ==========================================
+# Wire protocol: one JSON object per line each way. A request names its
+# input like the CLI does ("file", "arch", "elf", "binary", "tag") and lists
+# "queries" as 'KIND=FUNC' strings, optionally with a "policy" object; the
+# reply is run_batch() plus "ok", or {"ok": false, "error": ...}. {"op": "status"} describes the loaded dumps.
+# An optional "base" names an earlier version of "file" (e.g. the previous
+# submission) whose unchanged sections the new analysis may reuse.
+
+class AnalyzerPool:
+    """
+    Memory-bounded LRU of loaded analyzers, keyed by the requested inputs.
+    An entry is reused while the inputs' stat() stamps are unchanged; when a
+    stamp changes, a content hash decides whether the old analysis still
+    applies (touched but identical files are not re-parsed). An edited dump
+    is re-analyzed incrementally on top of its previous version.
+
+    `limits` are AnalysisBudget arguments for every analysis; the clock
+    restarts with each request. Partial analyses are never kept.
+    """
+    def __init__(self, max_bytes=512 << 20, cache=None, store=None, limits=None):
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.store = store
+        self.limits = limits
+        self.entries = OrderedDict()   # key -> [stamps, digests, analyzer]
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def get(self, request):
+        file, elf, binary = request.get('file'), request.get('elf'), request.get('binary')
+        key = (file, request.get('arch'), elf, binary, request.get('tag'))
+        paths = [p for p in (file, elf, binary) if p]
+        if not paths:
+            raise ValueError("request names no input (file, elf or binary)")
+        for path in paths:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"File {path} not found.")
+        stamps = [self._stamp(p) for p in paths]
+
+        entry = self.entries.get(key)
+        base = None
+        if entry is not None and entry[0] != stamps:
+            if [file_digest(p) for p in paths] == entry[1]:
+                entry[0] = stamps
+            else:
+                del self.entries[key]
+                base = entry[2]
+                entry = None
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            if entry[2].budget is not None:
+                entry[2].budget.start()
+            return entry[2]
+
+        if base is None and request.get('base') and request['base'] != file:
+            base = self.get(dict(request, file=request['base'], base=None, queries=()))
+            if base.partial is not None: base = None
+        self.misses += 1
+        digests = [file_digest(p) for p in paths]
+        budget = AnalysisBudget(**self.limits) if self.limits else None
+        analyzer = open_analyzer(file, request.get('arch'), elf, binary, request.get('tag'),
+                                 request.get('objdump'), cache=self.cache,
+                                 incremental=bool(file or binary), base=base, store=self.store, budget=budget)
+        if analyzer.partial is None:
+            self.entries[key] = [stamps, digests, analyzer]
+            self.trim()
+        return analyzer
+
+    def drop(self, analyzer):
+        """Forgets `analyzer`, e.g. once a query has left it partial."""
+        for key, entry in list(self.entries.items()):
+            if entry[2] is analyzer:
+                del self.entries[key]
+
+    def size(self):
+        return sum(entry[2].memory_estimate() for entry in self.entries.values())
+
+    def trim(self):
+        """Evicts least recently used analyzers until the budget fits (the newest always stays)."""
+        total = self.size()
+        while total > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            total -= entry[2].memory_estimate()
+
+    def status(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes': self.size(),
+            'max_bytes': self.max_bytes,
+            'store_entries': len(self.store.entries) if self.store is not None else None,
+            'loaded': [{'file': key[0] or key[3] or key[2], 'arch': analyzer.arch_name,
+                        'bytes': analyzer.memory_estimate(), 'incremental': analyzer.incremental_counts}
+                       for key, (_, _, analyzer) in self.entries.items()],
+        }
+
+class AnalysisRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers every request line on a connection until the client closes it,
+    or stays idle for `timeout` seconds.
+    """
+    timeout = 60
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                if not line.strip(): continue
+                reply = self.server.answer(line)
+                self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except OSError:
+            # Idle past the timeout, or the client went away
+            pass
+
+class AnalysisServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves queries against an AnalyzerPool on a Unix socket. Every
+    connection gets its own thread, so an idle client never blocks the
+    others; requests are still answered one at a time behind a lock, so
+    analyzers never need locking themselves.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, pool):
+        self.pool = pool
+        self.lock = threading.Lock()
+        super().__init__(path, AnalysisRequestHandler)
+
+    def answer(self, line):
+        with self.lock:
+            return self._answer(line)
+
+    def _answer(self, line):
+        try:
+            request = json.loads(line)
+            if request.get('op', 'query') == 'status':
+                return dict(self.pool.status(), ok=True)
+            queries = [parse_query(q) for q in request.get('queries', [])]
+            policy = Policy(request['policy']) if request.get('policy') is not None else None
+            analyzer = self.pool.get(request)
+            reply = run_batch(analyzer, queries, policy)
+            if analyzer.partial is not None:
+                self.pool.drop(analyzer)
+            # Recursive queries grow the closure; re-check the budget
+            self.pool.trim()
+            return dict(reply, ok=True)
+        except (Exception, SystemExit) as e:
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+
+def serve(path, max_bytes=512 << 20, cache=None, store=None, limits=None):
+    """Runs the daemon on `path` until interrupted; a stale socket file is replaced."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"a daemon is already listening on {path}")
+        finally:
+            probe.close()
+    server = AnalysisServer(path, AnalyzerPool(max_bytes, cache, store, limits))
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def request_daemon(path, request, timeout=None):
+    """
+    Sends one request to the daemon at `path` and returns its decoded reply.
+    No reply or an undecodable one raises ConnectionError, like a refused
+    connection.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(path)
+        conn.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        conn.shutdown(socket.SHUT_WR)
+        data = b''.join(iter(lambda: conn.recv(1 << 16), b''))
+    # A daemon killed mid-request closes the connection without an answer
+    if not data:
+        raise ConnectionError("connection closed without a reply")
+    try:
+        reply = json.loads(data)
+    except ValueError:
+        raise ConnectionError("invalid reply") from None
+    if not isinstance(reply, dict) or 'ok' not in reply:
+        raise ConnectionError("invalid reply")
+    return reply
+
 # ==========================================
 #  CLI
 # ==========================================
+def run_client(args, queries, single, policy=None):
+    """
+    Answers the CLI invocation through the daemon, printing exactly what a
+    local run would. Returns False if the daemon can't be reached.
+    """
+    absolute = lambda path: os.path.abspath(path) if path else None
+    batch = bool(queries) or args.json or policy is not None
+    if not queries and single:
+        queries = [single]
+    request = {
+        'file': absolute(args.file),
+        'arch': args.arch,
+        'elf': absolute(args.elf),
+        'binary': absolute(args.binary),
+        'tag': resolve_tag(args.tag) if args.binary else None,
+        'objdump': absolute(args.objdump) if args.objdump and os.sep in args.objdump else args.objdump,
+        'base': absolute(args.base),
+        'queries': [kind if func is None else f"{kind}={func}" for kind, func in queries],
+    }
+    if policy is not None:
+        request['policy'] = policy.doc
+    try:
+        reply = request_daemon(args.connect, request, args.connect_timeout)
+    except OSError as e:
+        print(f"Warning: daemon on {args.connect} unavailable ({e or type(e).__name__}); analyzing locally",
+              file=sys.stderr)
+        return False
+    if not reply.pop('ok'):
+        print(f"Error: {reply['error']}")
+        sys.exit(1)
+    _mode_disabled('--lazy', ((args.lazy, 'a daemon answer'),))
+    _mode_disabled('--parse-jobs', ((args.parse_jobs != 1, 'a daemon answer'),))
+
+    reply['file'] = args.binary or args.file or args.elf
+    if batch:
+        json.dump(reply, sys.stdout, indent=2)
+        print()
+    elif single:
+        print_result(single[0], reply['results'][0]['result'])
+    if not reply.get('policy', {'ok': True})['ok']:
+        sys.exit(1)
+    if reply.get('partial'):
+        print(f"Warning: {reply['partial_reason']}; results are partial", file=sys.stderr)
+        if not batch: sys.exit(3)
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description="Assembly Static Analyzer & Parser")
-    parser.add_argument("file", help="Objdump file (or use - to read from pipe)")
-    parser.add_argument("--arch", default="mips", choices=ARCH_CONFIG.keys())
+    parser.add_argument("file", nargs='?', help="Objdump file (or use - to read from pipe)")
+    parser.add_argument("--binary", metavar="BINARY",
+                        help="Disassemble BINARY with the toolchain objdump and parse its output on the fly")
+    parser.add_argument("-T", "--tag", metavar="TAG",
+                        help="Lab toolchain tag for --binary (amd64, mips, s390x, aarch64, armv7, riscv64, i386; "
+                             "default: $LAB_ARCH or native)")
+    parser.add_argument("--objdump", metavar="PATH", help="objdump executable to use with --binary")
+    parser.add_argument("--save-dump", metavar="PATH", help="With --binary, also write the raw dump to PATH")
+    parser.add_argument("--elf", metavar="BINARY",
+                        help="Take function boundaries from the ELF symbol table of BINARY; "
+                             "without a dump file, call edges come from its relocations")
+    parser.add_argument("--arch", choices=ARCH_CONFIG.keys(),
+                        help="Target architecture (default: mips; auto-detected per dump in multi-dump mode)")
     
     # Modes
     parser.add_argument("--dump-graph", action="store_true")
@@ -457,33 +3203,206 @@ def main():
     parser.add_argument("--list-instrs", metavar="FUNC")
     parser.add_argument("--list-instrs-recursive", metavar="FUNC")
 
+    # Batch mode: many queries, one parse, JSON output
+    parser.add_argument("-q", "--query", action="append", default=[], metavar="KIND[=FUNC]",
+                        help="Add a query to the batch (repeatable), e.g. list-callees-recursive=main")
+    parser.add_argument("--query-file", metavar="PATH",
+                        help="Read batch queries from a file, one 'KIND [FUNC]' per line")
+    parser.add_argument("--json", action="store_true", help="Emit results as a JSON document")
+    parser.add_argument("--policy", metavar="PATH",
+                        help="Check the grading rules in PATH (JSON) and add the report to the JSON "
+                             "output; exits with 1 on any violation")
+
+    # Persistent result cache
+    parser.add_argument("--cache-dir", metavar="DIR", default=os.environ.get('LAB_JUDGE_CACHE'),
+                        help="Cache parsed graphs in DIR (default: $LAB_JUDGE_CACHE, disabled if unset)")
+    parser.add_argument("--cache-max-mb", type=int, default=256, metavar="MB",
+                        help="Evict least recently used cache entries beyond this size (default: 256)")
+
+    # Shared store of per-section summaries (libc code common to all submissions)
+    parser.add_argument("--store-dir", metavar="DIR", default=os.environ.get('LAB_JUDGE_STORE'),
+                        help="Share parsed section summaries between dumps through DIR "
+                             "(default: $LAB_JUDGE_STORE, disabled if unset)")
+    parser.add_argument("--store-max-mb", type=int, default=256, metavar="MB",
+                        help="Evict least recently used store packs beyond this size (default: 256)")
+
+    # Root-driven analysis: parse only what the queries reach
+    parser.add_argument("--lazy", action="store_true",
+                        help="Index the dump and parse only the functions the queries reach "
+                             "(--list-funcs and --dump-graph still parse everything)")
+
+    # One huge dump over several processes
+    parser.add_argument("--parse-jobs", type=int, default=1, metavar="N",
+                        help="Lex a dump file in N worker processes, split at labels (0: CPU count; default: 1)")
+
+    # Multi-dump mode: many dumps over a process pool, JSON lines out
+    parser.add_argument("--dump-dir", metavar="DIR",
+                        help="Analyze every *.dump file in DIR (one JSON line per dump)")
+    parser.add_argument("--manifest", metavar="PATH",
+                        help="Analyze the dumps listed in PATH, one 'DUMP [ARCH]' per line")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="Worker processes for multi-dump mode (default: CPU count)")
+    parser.add_argument("-o", "--output", metavar="PATH", help="Write the JSON-lines report to PATH")
+
+    # Resource budgets for untrusted dumps: stop early, flag the results partial
+    parser.add_argument("--max-seconds", type=float, metavar="S",
+                        help="Stop analyzing after S seconds of wall time")
+    parser.add_argument("--max-lines", type=int, metavar="N", help="Read at most N lines of the dump")
+    parser.add_argument("--max-labels", type=int, metavar="N", help="Parse at most N labels")
+    parser.add_argument("--max-memory-mb", type=int, metavar="MB",
+                        help="Stop analyzing once it has grown the process's resident memory by MB")
+    parser.add_argument("--max-syscall-steps", type=int, metavar="N",
+                        help="Leave a syscall number as '?' if finding it means walking more than N blocks")
+
+    # Instrumentation
+    parser.add_argument("--stats", nargs='?', const='time', choices=['time', 'memory'],
+                        help="Print phase timings and parser counters as JSON on stderr; "
+                             "'memory' also traces per-phase allocation peaks (slower)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Run under cProfile and save the profile to PATH ('-' prints a summary to stderr)")
+
+    # Daemon mode: keep analyzers loaded between invocations
+    parser.add_argument("--serve", metavar="SOCKET", help="Run as a daemon answering queries on a Unix socket")
+    parser.add_argument("--serve-max-mb", type=int, default=512, metavar="MB",
+                        help="Memory budget for analyzers kept by the daemon (default: 512)")
+    parser.add_argument("--connect", metavar="SOCKET", default=os.environ.get('LAB_JUDGE_SOCKET'),
+                        help="Send the query to the daemon on SOCKET (default: $LAB_JUDGE_SOCKET); "
+                             "falls back to local analysis if it is not running")
+    parser.add_argument("--connect-timeout", type=float, default=60, metavar="S",
+                        help="Analyze locally if the daemon has not answered within S seconds (default: 60)")
+    parser.add_argument("--base", metavar="DUMP",
+                        help="With --connect, let the daemon reuse its analysis of DUMP (e.g. the previous "
+                             "submission) for every unchanged section")
+
     args = parser.parse_args()
-    analyzer = AssemblyAnalyzer(args.file, args.arch)
+    try:
+        queries = [parse_query(q) for q in args.query]
+        if args.query_file:
+            queries += read_query_file(args.query_file)
+        policy = Policy.load(args.policy) if args.policy else None
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    limits = {name: value for name, value in (('seconds', args.max_seconds), ('max_lines', args.max_lines),
+                                              ('max_labels', args.max_labels),
+                                              ('max_memory_mb', args.max_memory_mb),
+                                              ('max_steps', args.max_syscall_steps))
+              if value is not None}
 
-    if args.dump_graph:
-        for func in analyzer.get_all_functions():
-            callees = analyzer.get_direct_callees(func)
-            sys_list = analyzer.get_syscalls(func)
-            tag = f" [syscall: {','.join(sys_list)}]" if sys_list else ""
-            if callees:
-                print(f"{func}{tag} -> {', '.join(callees)}")
-            else:
-                print(f"{func}{tag} (no calls)")
+    if args.dump_dir or args.manifest:
+        if not queries and policy is None:
+            parser.error("multi-dump mode needs at least one --query/--query-file or a --policy")
+        if args.profile:
+            parser.error("--profile is not supported in multi-dump mode")
+        try:
+            jobs = read_manifest(args.manifest) if args.manifest else []
+            if args.dump_dir:
+                jobs += [(os.path.join(args.dump_dir, name), None)
+                         for name in sorted(os.listdir(args.dump_dir)) if name.endswith('.dump')]
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+        _mode_disabled('--parse-jobs', ((args.parse_jobs != 1, 'multi-dump mode'),))
+        _mode_disabled('--base', ((args.base is not None, 'multi-dump mode'),))
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            failed = grade_many(jobs, queries, out, args.jobs, args.arch,
+                                args.cache_dir, args.cache_max_mb << 20, bool(args.stats),
+                                args.store_dir, args.store_max_mb << 20, args.lazy, policy, limits)
+        finally:
+            if out is not sys.stdout: out.close()
+        sys.exit(1 if failed else 0)
+
+    if args.serve:
+        _mode_disabled('--lazy', ((args.lazy, '--serve'),))
+        _mode_disabled('--parse-jobs', ((args.parse_jobs != 1, '--serve'),))
+        _mode_disabled('--base', ((args.base is not None, '--serve'),))
+        try:
+            cache = AnalysisCache(args.cache_dir, args.cache_max_mb << 20) if args.cache_dir else None
+            store = SummaryStore(args.store_dir, args.store_max_mb << 20) if args.store_dir else None
+            serve(args.serve, args.serve_max_mb << 20, cache, store, limits)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    if not args.file and not args.elf and not args.binary:
+        parser.error("the following arguments are required: file (or --binary/--elf)")
+
+    # The classic single-mode flags, first match wins
+    single = None
+    for kind, (_, takes_func) in QUERIES.items():
+        value = getattr(args, kind.replace('-', '_'))
+        if value:
+            single = (kind, value if takes_func else None)
+            break
+
+    # The daemon applies its own budgets, so explicit limits mean a local run too
+    if args.connect and args.file != '-' and not (args.stats or args.profile or args.save_dump or limits):
+        if run_client(args, queries, single, policy):
+            return
+    # Only a daemon holds the base analysis to build on
+    _mode_disabled('--base', ((args.base is not None, 'a local analysis'),))
+
+    cache = None
+    if args.cache_dir:
+        try:
+            cache = AnalysisCache(args.cache_dir, args.cache_max_mb << 20)
+        except OSError as e:
+            print(f"Warning: cache disabled ({e})", file=sys.stderr)
+    store = None
+    if args.store_dir:
+        try:
+            store = SummaryStore(args.store_dir, args.store_max_mb << 20)
+        except OSError as e:
+            print(f"Warning: summary store disabled ({e})", file=sys.stderr)
+    # More workers than CPUs only adds pickling and merging to a serial parse
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    parse_jobs = min(args.parse_jobs or cpus, cpus)
+    _mode_disabled('--parse-jobs', ((args.parse_jobs > 1 and cpus == 1, 'a single CPU'),))
+    stats = AnalysisStats() if args.stats else None
+    if args.stats == 'memory':
+        tracemalloc.start()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        try:
+            analyzer = open_analyzer(args.file, args.arch, args.elf, args.binary, args.tag, args.objdump,
+                                     cache, args.save_dump, stats, store=store, lazy=args.lazy,
+                                     parse_jobs=parse_jobs,
+                                     budget=AnalysisBudget(**limits) if limits else None)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        violated = partial = False
+        with analyzer.phase('queries'):
+            if queries or args.json or policy is not None:
+                if not queries and single:
+                    queries = [single]
+                doc = run_batch(analyzer, queries, policy)
+                violated = policy is not None and not doc['policy']['ok']
+                json.dump(doc, sys.stdout, indent=2)
+                print()
+            elif single:
+                print_query(analyzer, *single)
+                # Plain text has nowhere to flag a truncated answer but the status
+                partial = analyzer.partial is not None
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler, args.profile)
 
-    elif args.list_funcs:
-        print("\n".join(analyzer.get_all_functions()))
-    elif args.list_callees:
-        print(" ".join(analyzer.get_direct_callees(args.list_callees)))
-    elif args.list_callees_recursive:
-        print(" ".join(analyzer.get_indirect_callees(args.list_callees_recursive)))
-    elif args.list_syscalls:
-        print(" ".join(analyzer.get_syscalls(args.list_syscalls)))
-    elif args.list_syscalls_recursive:
-        print(" ".join(analyzer.get_indirect_syscalls(args.list_syscalls_recursive)))
-    elif args.list_instrs:
-        print(" ".join(analyzer.get_direct_instrs(args.list_instrs)))
-    elif args.list_instrs_recursive:
-        print(" ".join(analyzer.get_indirect_instrs(args.list_instrs_recursive)))
+    if stats is not None:
+        sys.stdout.flush()
+        json.dump(stats.report(analyzer), sys.stderr, indent=2)
+        print(file=sys.stderr)
+    if violated:
+        sys.exit(1)
+    if partial:
+        sys.exit(3)
 
 if __name__ == "__main__":
     main()
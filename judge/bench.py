@@ -0,0 +1,418 @@
+"""
+Benchmark suite for analyze.py.
+
+Generates synthetic `objdump -d -r` output for every architecture in
+ARCH_CONFIG and times each analyzer phase and query family on it. Dumps are
+generated from a fixed seed, so results are reproducible and can be
+compared across commits:
+
+    python3 bench.py run -o before.json
+    ... change analyze.py ...
+    python3 bench.py run -o after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+
+import analyze
+
+# ==============================================================================
+#  DIALECTS
+# ==============================================================================
+# Per-architecture templates for the synthetic disassembly. Every operand
+# template may use {addr} (branch/call target address), {sym} (target name)
+# and {n} (syscall number). Fillers never write the syscall register, so a
+# number set in an earlier block reaches the syscall through the dataflow.
+MIPS_DIALECT = {
+    'wide':     False,
+    'encoding': 'word',
+    'call':     ('jal', '{addr:x} <{sym}>'),
+    'ret':      [('jr', 'ra'), ('nop', '')],
+    'cond':     [('bnez', 'v0,{addr:x} <{sym}>'), ('nop', '')],
+    'set_sys':  ('li', 'v0,{n}'),
+    'syscall':  ('syscall', ''),
+    'reloc':    'R_MIPS_26',
+    'filler': [
+        ('addiu', 'sp,sp,-24'), ('sw', 'ra,20(sp)'), ('lw', 'a0,16(sp)'), ('addu', 'v1,a0,a1'),
+        ('move', 'a0,s0'), ('lui', 'a0,0x41'), ('mul', 'v1,v1,a2'), ('slt', 't0,a0,a1'),
+        ('sll', 'v1,v1,0x2'), ('sll', 'zero,zero,0x0'), ('lw', 'v1,24(sp)'), ('div', 'zero,a0,a1'),
+    ],
+}
+
+DIALECTS = {
+    'mips':   dict(MIPS_DIALECT, format='elf32-tradbigmips'),
+    'mipsel': dict(MIPS_DIALECT, format='elf32-tradlittlemips'),
+    'x86': {
+        'format':   'elf64-x86-64',
+        'wide':     True,
+        'encoding': 'bytes',
+        'call':     ('call', '{addr:x} <{sym}>'),
+        'ret':      [('leave', ''), ('ret', '')],
+        'cond':     [('jne', '{addr:x} <{sym}>')],
+        'set_sys':  ('mov', '$0x{n:x},%eax'),
+        'syscall':  ('syscall', ''),
+        'reloc':    'R_X86_64_PLT32',
+        'filler': [
+            ('push', '%rbp'), ('mov', '%rsp,%rbp'), ('sub', '$0x10,%rsp'), ('mov', '%edi,-0x14(%rbp)'),
+            ('add', '-0x8(%rbp),%rdx'), ('imul', '%edx,%ecx'), ('lea', '0x0(,%rax,4),%rdx'),
+            ('cmp', '$0x1,%ecx'), ('xor', '%ecx,%ecx'), ('mov', '-0x4(%rbp),%ecx'), ('pop', '%rbp'),
+            ('shl', '$0x2,%ecx'),
+        ],
+    },
+    'arm': {
+        'format':   'elf32-littlearm',
+        'wide':     False,
+        'encoding': 'word',
+        'call':     ('bl', '{addr:x} <{sym}>'),
+        'ret':      [('pop', '{{fp, pc}}')],
+        'cond':     [('bne', '{addr:x} <{sym}>')],
+        'set_sys':  ('mov', 'r7, #{n}'),
+        'syscall':  ('svc', '0x00000000'),
+        'reloc':    'R_ARM_CALL',
+        'filler': [
+            ('push', '{{fp, lr}}'), ('add', 'fp, sp, #4'), ('sub', 'sp, sp, #8'), ('str', 'r0, [fp, #-8]'),
+            ('ldr', 'r3, [fp, #-8]'), ('mul', 'r3, r2, r3'), ('cmp', 'r3, #0'), ('mov', 'r0, r3'),
+            ('pop', '{{r4}}'), ('lsl', 'r3, r3, #2'), ('nop', ''), ('sdiv', 'r0, r0, r1'),
+        ],
+    },
+    'aarch64': {
+        'format':   'elf64-littleaarch64',
+        'wide':     True,
+        'encoding': 'word',
+        'call':     ('bl', '{addr:x} <{sym}>'),
+        'ret':      [('ldp', 'x29, x30, [sp], #32'), ('ret', '')],
+        'cond':     [('b.ne', '{addr:x} <{sym}>')],
+        'set_sys':  ('mov', 'x8, #0x{n:x}'),
+        'syscall':  ('svc', '#0x0'),
+        'reloc':    'R_AARCH64_CALL26',
+        'filler': [
+            ('stp', 'x29, x30, [sp, #-32]!'), ('mov', 'x29, sp'), ('str', 'w0, [sp, #28]'),
+            ('ldr', 'w0, [sp, #28]'), ('add', 'w0, w0, #0x1'), ('mul', 'w0, w1, w0'), ('cmp', 'w0, #0x0'),
+            ('adrp', 'x0, 490000 <data>'), ('nop', ''), ('sdiv', 'w0, w0, w1'), ('lsl', 'w1, w1, #2'),
+        ],
+    },
+    's390x': {
+        'format':   'elf64-s390',
+        'wide':     True,
+        'encoding': 'bytes',
+        'call':     ('brasl', '%r14,{addr:x} <{sym}>'),
+        'ret':      [('lmg', '%r11,%r15,256(%r11)'), ('br', '%r14')],
+        'cond':     [('jne', '{addr:x} <{sym}>')],
+        'set_sys':  ('lghi', '%r1,{n}'),
+        'syscall':  ('svc', '0'),
+        'reloc':    'R_390_PLT32DBL',
+        'filler': [
+            ('stmg', '%r11,%r15,88(%r15)'), ('aghi', '%r15,-168'), ('lgr', '%r11,%r15'),
+            ('lg', '%r2,160(%r11)'), ('ahi', '%r2,1'), ('msr', '%r2,%r3'), ('chi', '%r2,0'),
+            ('st', '%r2,164(%r11)'), ('nopr', '%r7'), ('dsgr', '%r4,%r5'),
+        ],
+    },
+    'riscv64': {
+        'format':   'elf64-littleriscv',
+        'wide':     True,
+        'encoding': 'word',
+        'call':     ('jal', 'ra,{addr:x} <{sym}>'),
+        'ret':      [('ld', 'ra,24(sp)'), ('ret', '')],
+        'cond':     [('bnez', 'a0,{addr:x} <{sym}>')],
+        'set_sys':  ('li', 'a7,{n}'),
+        'syscall':  ('ecall', ''),
+        'reloc':    'R_RISCV_CALL_PLT',
+        'filler': [
+            ('addi', 'sp,sp,-32'), ('sd', 'ra,24(sp)'), ('sd', 's0,16(sp)'), ('addi', 's0,sp,32'),
+            ('lw', 'a5,-20(s0)'), ('addw', 'a5,a5,a4'), ('mv', 'a0,a5'), ('slli', 'a5,a5,0x2'),
+            ('mulw', 'a5,a4,a5'), ('nop', ''), ('divw', 'a0,a0,a1'),
+        ],
+    },
+}
+
+# Functions that synthetic programs call through relocations (never defined)
+EXTERNALS = ['printf', 'puts', 'malloc', 'free', 'exit', 'read', 'write', 'memcpy', 'strlen', 'abort']
+
+# Named scales for `run`; individual knobs can still be overridden
+SCALES = {
+    'small':  dict(functions=200,   blocks=3, instrs=8,  depth=6,  cycles=4),
+    'medium': dict(functions=2000,  blocks=4, instrs=10, depth=12, cycles=20),
+    'large':  dict(functions=20000, blocks=4, instrs=12, depth=24, cycles=100),
+}
+
+# ==============================================================================
+#  GENERATOR
+# ==============================================================================
+def generate_dump(arch, functions=2000, blocks=4, instrs=10, depth=12, cycles=20,
+                  calls=3, relocs=0.2, syscalls=0.3, seed=1):
+    """
+    Returns synthetic objdump text for `arch`.
+
+    functions: number of functions; blocks: labels per function;
+    instrs: filler instructions per block; depth: layers of the call DAG
+    (function 0 is `main` at the top); cycles: extra back edges creating
+    recursion; calls: callees per function; relocs: fraction of calls going
+    to external symbols through relocations; syscalls: fraction of
+    functions that issue a syscall (half of them resolved across blocks).
+    """
+    d = DIALECTS[arch]
+    rng = random.Random(f"{seed}:{arch}")
+    names = ['main'] + [f"func_{i:05d}" for i in range(1, functions)]
+    layer = [0] + [1 + (i * (depth - 1)) // max(1, functions - 1) for i in range(1, functions)]
+    by_layer = {}
+    for i, l in enumerate(layer):
+        by_layer.setdefault(l, []).append(i)
+
+    # Call graph: edges go to deeper layers, plus back edges for cycles
+    callees = [[] for _ in range(functions)]
+    for i in range(functions):
+        deeper = [l for l in by_layer if l > layer[i]]
+        for _ in range(calls if deeper else 0):
+            callees[i].append(rng.choice(by_layer[rng.choice(deeper)]))
+    for _ in range(cycles):
+        a, b = rng.randrange(functions), rng.randrange(functions)
+        callees[max(a, b)].append(min(a, b))
+
+    # Lay out addresses first so every branch/call has a real target address
+    step = 4
+    base = 0x400000 if d['wide'] else 0x10000
+    per_block = instrs + 6 + max(map(len, callees))
+    block_addr = lambda f, b: base + ((f * blocks + b) * per_block) * step
+    func_addr = lambda f: block_addr(f, 0)
+
+    addr_w = 16 if d['wide'] else 8
+    out = [f"\nbench:     file format {d['format']}\n\n\nDisassembly of section .text:\n"]
+    filler = d['filler']
+
+    def emit(addr, mnem, args):
+        if d['encoding'] == 'word':
+            enc = f"{rng.getrandbits(32):08x} "
+            text = f"{mnem}\t{args}" if args else mnem
+        else:
+            n = rng.choice((2, 4, 6)) if arch == 's390x' else rng.randint(1, 7)
+            enc = ' '.join(f"{rng.getrandbits(8):02x}" for _ in range(n)).ljust(20)
+            text = f"{mnem:<6} {args}" if arch == 'x86' else (f"{mnem}\t{args}" if args else mnem)
+        out.append(f"  {addr:x}:\t{enc}\t{text}")
+
+    for f in range(functions):
+        fcalls = list(callees[f])
+        sys_block = rng.randrange(blocks) if rng.random() < syscalls else -1
+        # Half the syscalls get their number from the previous block
+        set_block = sys_block - 1 if sys_block > 0 and rng.random() < 0.5 else sys_block
+        sys_num = rng.choice((1, 3, 4, 5, 10, 60, 93, 4001, 4004))
+        for b in range(blocks):
+            label = names[f] if b == 0 else f"{names[f]}_L{b}"
+            addr = block_addr(f, b)
+            out.append(f"\n{addr:0{addr_w}x} <{label}>:")
+            for _ in range(instrs):
+                emit(addr, *_fmt(rng.choice(filler))); addr += step
+
+            if b == sys_block:
+                if set_block == b:
+                    emit(addr, *_fmt(d['set_sys'], n=sys_num)); addr += step
+                emit(addr, *_fmt(d['syscall'])); addr += step
+
+            if fcalls:
+                callee = fcalls.pop()
+                if rng.random() < relocs:
+                    emit(addr, *_fmt(d['call'], addr=addr, sym=names[f]))
+                    out.append(f"\t\t\t{addr:x}: {d['reloc']}\t{rng.choice(EXTERNALS)}")
+                else:
+                    emit(addr, *_fmt(d['call'], addr=func_addr(callee), sym=names[callee]))
+                addr += step
+            if b == set_block != sys_block:
+                emit(addr, *_fmt(d['set_sys'], n=sys_num)); addr += step
+
+            if b + 1 < blocks:
+                target = rng.randrange(blocks)
+                tlabel = names[f] if target == 0 else f"{names[f]}_L{target}"
+                for tpl in d['cond']:
+                    emit(addr, *_fmt(tpl, addr=block_addr(f, target), sym=tlabel)); addr += step
+            else:
+                # Remaining calls go in the last block before returning
+                for callee in fcalls:
+                    emit(addr, *_fmt(d['call'], addr=func_addr(callee), sym=names[callee])); addr += step
+                for tpl in d['ret']:
+                    emit(addr, *_fmt(tpl)); addr += step
+    out.append("")
+    return "\n".join(out)
+
+def _fmt(tpl, **kw):
+    mnem, args = tpl
+    return mnem, args.format(**kw)
+
+# ==============================================================================
+#  TIMING
+# ==============================================================================
+# Query families, timed over every function of the dump
+FAMILIES = (
+    ('list-funcs',         lambda a, fs: a.get_all_functions()),
+    ('callees',            lambda a, fs: [a.get_direct_callees(f) for f in fs]),
+    ('instrs',             lambda a, fs: [a.get_direct_instrs(f) for f in fs]),
+    ('syscalls',           lambda a, fs: [a.get_syscalls(f) for f in fs]),
+    ('callees-recursive',  lambda a, fs: [a.get_indirect_callees(f) for f in fs]),
+    ('instrs-recursive',   lambda a, fs: [a.get_indirect_instrs(f) for f in fs]),
+    ('syscalls-recursive', lambda a, fs: [a.get_indirect_syscalls(f) for f in fs]),
+)
+
+def bench_dump(path, arch, repeat=3):
+    """Times one dump; every metric is the minimum over `repeat` runs."""
+    best = {}
+    def record(key, value):
+        best[key] = min(best.get(key, value), value)
+
+    for _ in range(repeat):
+        stats = analyze.AnalysisStats()
+        start = time.perf_counter()
+        analyzer = analyze.AssemblyAnalyzer(path, arch, stats=stats)
+        record('construct', time.perf_counter() - start)
+        funcs = analyzer.get_all_functions()
+        for name, query in FAMILIES:
+            start = time.perf_counter()
+            query(analyzer, funcs)
+            record('q:' + name, time.perf_counter() - start)
+        # 'closure' is built lazily by the first recursive query
+        for name, entry in stats.phases.items():
+            record(name, entry['seconds'])
+    report = stats.report(analyzer)
+
+    # Peak memory in a separate run: tracemalloc distorts timings
+    tracemalloc.start()
+    analyzer = analyze.AssemblyAnalyzer(path, arch)
+    analyzer.get_indirect_callees('main')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'functions': len(analyzer.functions),
+        'phases':    {k: v for k, v in best.items() if not k.startswith('q:')},
+        'queries':   {k[2:]: v for k, v in best.items() if k.startswith('q:')},
+        'peak_mb':   round(peak / (1 << 20), 2),
+        'counters':  {k: report[k] for k in ('lines', 'syscalls', 'search')},
+    }
+
+def _git_commit():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.run(['git', '-C', here, 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    params = dict(SCALES[args.scale])
+    for knob in ('functions', 'blocks', 'instrs', 'depth', 'cycles'):
+        if getattr(args, knob) is not None:
+            params[knob] = getattr(args, knob)
+    params.update(relocs=args.relocs, syscalls=args.syscalls, seed=args.seed)
+
+    report = {
+        'meta': {
+            'commit':  _git_commit(),
+            'python':  platform.python_version(),
+            'machine': platform.machine(),
+            'scale':   args.scale,
+            'params':  params,
+            'repeat':  args.repeat,
+        },
+        'cases': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for arch in args.arch or list(analyze.ARCH_CONFIG):
+            text = generate_dump(arch, **params)
+            path = os.path.join(tmp, f"{arch}.dump")
+            with open(path, 'w') as f:
+                f.write(text)
+            case = bench_dump(path, arch, args.repeat)
+            case['lines'] = text.count('\n')
+            case['bytes'] = len(text)
+            case['dump_sha'] = hashlib.sha1(text.encode()).hexdigest()[:12]
+            case['lines_per_sec'] = round(case['lines'] / case['phases']['parse'])
+            report['cases'][arch] = case
+            print(f"{arch:8} {case['lines']:>9} lines  construct {case['phases']['construct']:.3f}s  "
+                  f"peak {case['peak_mb']:.1f} MB", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+def compare(old, new, out=sys.stderr):
+    """Prints new/old ratios for every metric present in both reports."""
+    if old['meta'].get('params') != new['meta'].get('params'):
+        print("Warning: reports were generated with different parameters", file=out)
+    print(f"{'case':8} {'metric':28} {'old':>10} {'new':>10} {'ratio':>7}", file=out)
+    for arch, case in new['cases'].items():
+        base = old['cases'].get(arch)
+        if base is None: continue
+        if case.get('dump_sha') != base.get('dump_sha'):
+            print(f"Warning: {arch}: generated dump differs between reports", file=out)
+        rows = [(f"phase:{k}", v, base['phases'].get(k)) for k, v in case['phases'].items()]
+        rows += [(f"query:{k}", v, base['queries'].get(k)) for k, v in case['queries'].items()]
+        rows.append(('peak_mb', case['peak_mb'], base.get('peak_mb')))
+        for metric, now, before in rows:
+            if before is None: continue
+            ratio = now / before if before else float('inf')
+            print(f"{arch:8} {metric:28} {before:10.4f} {now:10.4f} {ratio:7.2f}", file=out)
+
+# ==========================================
+#  CLI
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the assembly static analyzer")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    knobs = argparse.ArgumentParser(add_help=False)
+    knobs.add_argument("--functions", type=int, help="Number of functions")
+    knobs.add_argument("--blocks", type=int, help="Labels per function")
+    knobs.add_argument("--instrs", type=int, help="Filler instructions per block")
+    knobs.add_argument("--depth", type=int, help="Call graph depth")
+    knobs.add_argument("--cycles", type=int, help="Back edges (recursion) in the call graph")
+    knobs.add_argument("--relocs", type=float, default=0.2, help="Fraction of calls through relocations")
+    knobs.add_argument("--syscalls", type=float, default=0.3, help="Fraction of functions with a syscall")
+    knobs.add_argument("--seed", type=int, default=1)
+    knobs.add_argument("--scale", choices=SCALES, default='medium')
+
+    p_run = sub.add_parser('run', parents=[knobs], help="Generate dumps and time the analyzer")
+    p_run.add_argument("--arch", action='append', choices=analyze.ARCH_CONFIG.keys(),
+                       help="Architecture to benchmark (repeatable, default: all)")
+    p_run.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    p_run.add_argument("-o", "--output", metavar="PATH", help="Write the JSON report to PATH")
+    p_run.add_argument("--compare", metavar="PATH", help="Print ratios against an earlier report")
+
+    p_gen = sub.add_parser('generate', parents=[knobs], help="Write one synthetic dump")
+    p_gen.add_argument("arch", choices=analyze.ARCH_CONFIG.keys())
+    p_gen.add_argument("-o", "--output", metavar="PATH", help="Output file (default: stdout)")
+
+    p_cmp = sub.add_parser('compare', help="Compare two JSON reports")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'generate':
+        params = dict(SCALES[args.scale])
+        for knob in ('functions', 'blocks', 'instrs', 'depth', 'cycles'):
+            if getattr(args, knob) is not None:
+                params[knob] = getattr(args, knob)
+        text = generate_dump(args.arch, relocs=args.relocs, syscalls=args.syscalls, seed=args.seed, **params)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+    else:
+        with open(args.old) as f_old, open(args.new) as f_new:
+            compare(json.load(f_old), json.load(f_new), sys.stdout)
+
+if __name__ == "__main__":
+    main()
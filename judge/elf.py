@@ -0,0 +1,334 @@
+"""
+ELF input for analyze.py (--elf): function symbols, call relocations and
+direct call encodings, read straight from the file without binutils.
+"""
+import os
+import re
+import mmap
+import struct
+
+# ==============================================================================
+#  ELF INPUT
+# ==============================================================================
+# e_machine -> ARCH_CONFIG key (MIPS is refined by endianness below)
+ELF_MACHINES = {3: 'x86', 8: 'mips', 22: 's390x', 40: 'arm', 62: 'x86', 183: 'aarch64', 243: 'riscv64'}
+
+SHT_SYMTAB, SHT_RELA, SHT_NOBITS, SHT_REL, SHT_DYNSYM = 2, 4, 8, 9, 11
+SHF_EXECINSTR = 0x4
+STT_NOTYPE, STT_FUNC, STT_SECTION = 0, 2, 3
+STB_LOCAL = 0
+ET_REL = 1
+
+# Call relocation types, for resolving section-relative targets (section
+# symbol + addend): e_machine -> {type: (how REL sections store the addend
+# in the instruction, distance from the target to S + A)}
+CALL_RELOCS = {
+    62:  {2: (None, 4), 4: (None, 4)},                                     # PC32, PLT32
+    3:   {2: ('word', 4), 4: ('word', 4)},                                 # PC32, PLT32
+    183: {282: (None, 0), 283: (None, 0)},                                 # JUMP26, CALL26
+    243: {17: (None, 0), 18: (None, 0), 19: (None, 0)},                    # JAL, CALL, CALL_PLT
+    22:  {16: (None, -2), 17: (None, -2), 19: (None, -2), 20: (None, -2)},  # PC/PLT 16/32DBL
+    40:  {1: ('arm', 8), 28: ('arm', 8), 29: ('arm', 8),                   # PC24, CALL, JUMP24
+          10: ('thumb', 4), 30: ('thumb', 4)},                             # THM_CALL, THM_JUMP24
+    8:   {4: ('mips26', 0)},                                               # 26
+}
+
+def _signed(value, bits):
+    return value - (1 << bits) if value >> (bits - 1) & 1 else value
+
+def _thumb_offset(hw1, hw2):
+    """Branch offset of a Thumb-2 BL/BLX pair."""
+    s = hw1 >> 10 & 1
+    i1 = 1 ^ (hw2 >> 13 & 1) ^ s
+    i2 = 1 ^ (hw2 >> 11 & 1) ^ s
+    return _signed(s << 24 | i1 << 23 | i2 << 22 | (hw1 & 0x3ff) << 12 | (hw2 & 0x7ff) << 1, 25)
+
+class ElfFile:
+    """
+    Minimal, dependency-free ELF32/ELF64 reader for either endianness.
+    The file is memory-mapped and only the section headers, symbol tables
+    and relocation sections are ever decoded.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < 52:
+                raise ValueError(f"{path}: not a valid ELF file")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_headers()
+        except (ValueError, struct.error, IndexError):
+            self.close()
+            raise ValueError(f"{path}: not a valid ELF file") from None
+
+    def _read_headers(self):
+        """
+        Decodes the ELF and section headers, checking that every table the
+        reader will touch lies inside the file.
+        """
+        data = self._map
+        if data[:4] != b'\x7fELF' or data[4] not in (1, 2) or data[5] not in (1, 2):
+            raise ValueError
+        self.is64 = data[4] == 2
+        self.big_endian = data[5] == 2
+        e = '>' if self.big_endian else '<'
+        if self.is64:
+            hdr = struct.unpack_from(e + 'HHIQQQIHHHHHH', data, 16)
+            self._shdr = struct.Struct(e + 'IIQQQQIIQQ')
+            self._sym = struct.Struct(e + 'IBBHQQ')
+            self._rel = struct.Struct(e + 'QQ')
+            self._rela = struct.Struct(e + 'QQq')
+        else:
+            hdr = struct.unpack_from(e + 'HHIIIIIHHHHHH', data, 16)
+            self._shdr = struct.Struct(e + 'IIIIIIIIII')
+            self._sym = struct.Struct(e + 'IIIBBH')
+            self._rel = struct.Struct(e + 'II')
+            self._rela = struct.Struct(e + 'IIi')
+        self.e_type, self.e_machine = hdr[0], hdr[1]
+        shoff, shnum, shstrndx = hdr[5], hdr[11], hdr[12]
+
+        # (name_off, type, flags, addr, offset, size, link, info, align, entsize)
+        self.sections = []
+        if shoff:
+            if shoff + self._shdr.size > len(data):
+                raise ValueError
+            first = self._shdr.unpack_from(data, shoff)
+            shnum = shnum or first[5]          # Extended numbering
+            if shstrndx == 0xffff: shstrndx = first[6]
+            if shoff + shnum * self._shdr.size > len(data):
+                raise ValueError
+            self.sections = [list(self._shdr.unpack_from(data, shoff + i * self._shdr.size))
+                             for i in range(shnum)]
+            for sh in self.sections:
+                if sh[1] not in (0, SHT_NOBITS) and sh[4] + sh[5] > len(data):
+                    raise ValueError
+                if sh[1] in (SHT_SYMTAB, SHT_DYNSYM, SHT_REL, SHT_RELA) and sh[6] >= shnum:
+                    raise ValueError
+            strtab = self.sections[shstrndx] if shstrndx < shnum else None
+            for sh in self.sections:
+                sh[0] = self._cstr(strtab[4] + sh[0]) if strtab else ''
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def arch(self):
+        arch = ELF_MACHINES.get(self.e_machine)
+        if arch == 'mips' and not self.big_endian:
+            return 'mipsel'
+        return arch
+
+    def _cstr(self, offset):
+        end = self._map.find(b'\0', offset)
+        if end < 0:
+            raise ValueError(f"{self.path}: not a valid ELF file")
+        return self._map[offset:end].decode('utf-8', 'replace')
+
+    def symbols(self, sh, binding=False):
+        """
+        Yields (name, value, size, type, shndx) for every symbol of a symbol
+        table section, plus the binding if `binding` is set.
+        """
+        strtab = self.sections[sh[6]]
+        # Released on the way out, so an error mid-table can still close the map
+        with memoryview(self._map)[sh[4]:sh[4] + sh[5] - sh[5] % self._sym.size] as data:
+            for ent in self._sym.iter_unpack(data):
+                if self.is64:
+                    name, info, _, shndx, value, size = ent
+                else:
+                    name, value, size, info, _, shndx = ent
+                name = self._cstr(strtab[4] + name) if name else ''
+                if binding:
+                    yield name, value, size, info & 0xf, shndx, info >> 4
+                else:
+                    yield name, value, size, info & 0xf, shndx
+
+    def relocations(self, sh, details=False):
+        """
+        Yields (offset, symbol index) for every entry of a REL/RELA section;
+        with `details`, (offset, symbol index, type, addend), where the
+        addend of a REL entry is None (it lives in the instruction).
+        """
+        rela = sh[1] == SHT_RELA
+        fmt = self._rela if rela else self._rel
+        shift = 32 if self.is64 else 8
+        with memoryview(self._map)[sh[4]:sh[4] + sh[5] - sh[5] % fmt.size] as data:
+            for ent in fmt.iter_unpack(data):
+                if details:
+                    yield ent[0], ent[1] >> shift, ent[1] & ((1 << shift) - 1), ent[2] if rela else None
+                else:
+                    yield ent[0], ent[1] >> shift
+
+    def function_symbols(self):
+        """
+        Defined STT_FUNC symbols as (name, start, size, section index), taken
+        from .symtab when present and .dynsym otherwise.
+        """
+        tables = [sh for sh in self.sections if sh[1] == SHT_SYMTAB] or \
+                 [sh for sh in self.sections if sh[1] == SHT_DYNSYM]
+        funcs = []
+        seen = set()
+        for sh in tables:
+            for name, value, size, typ, shndx in self.symbols(sh):
+                if typ != STT_FUNC or shndx == 0 or not name or name in seen: continue
+                if self.e_machine == 40: value &= ~1   # Thumb bit
+                seen.add(name)
+                funcs.append((name, value, size, shndx))
+        return funcs
+
+    def local_functions(self):
+        """Names of the defined STT_FUNC symbols with local binding (static functions)."""
+        tables = [sh for sh in self.sections if sh[1] == SHT_SYMTAB]
+        return {name for sh in tables for name, _, _, typ, shndx, bind in self.symbols(sh, True)
+                if typ == STT_FUNC and shndx and name and bind == STB_LOCAL}
+
+    def _function_starts(self):
+        """(section index, or None in linked images, start) -> function name."""
+        key = self.e_type == ET_REL
+        return {(shndx if key else None, start): name for name, start, _, shndx in self.function_symbols()}
+
+    def _code(self, shndx):
+        sh = self.sections[shndx]
+        if sh[1] == SHT_NOBITS: return b''
+        return self._map[sh[4]:sh[4] + sh[5]]
+
+    def _implicit_addend(self, shndx, offset, kind):
+        """Addend a REL relocation of `kind` keeps in the instruction at `offset`."""
+        e = '>' if self.big_endian else '<'
+        code = self._code(shndx)
+        if self.e_type != ET_REL: offset -= self.sections[shndx][3]
+        if not 0 <= offset <= len(code) - 4: return None
+        if kind == 'thumb':
+            hw1, hw2 = struct.unpack_from(e + 'HH', code, offset)
+            return _thumb_offset(hw1, hw2)
+        word = struct.unpack_from(e + 'I', code, offset)[0]
+        if kind == 'word': return _signed(word, 32)
+        if kind == 'arm': return _signed(word & 0xffffff, 24) << 2
+        return (word & 0x3ffffff) << 2
+
+    def call_relocations(self):
+        """
+        Yields (section index, offset, target name) for relocations applied to
+        executable sections whose target is a function or an undefined symbol.
+        A section symbol (calls to static functions, -ffunction-sections) is
+        resolved through the addend to the function starting there; data
+        symbols are skipped.
+        """
+        starts = None
+        bias = CALL_RELOCS.get(self.e_machine, {})
+        for sh in self.sections:
+            if sh[1] not in (SHT_REL, SHT_RELA) or sh[7] >= len(self.sections): continue
+            if not self.sections[sh[7]][2] & SHF_EXECINSTR: continue
+            symtab = self.sections[sh[6]]
+            if symtab[1] not in (SHT_SYMTAB, SHT_DYNSYM): continue
+            syms = list(self.symbols(symtab))
+            for offset, sym_idx, typ, addend in self.relocations(sh, True):
+                if sym_idx >= len(syms): continue
+                name, value, _, sym_typ, shndx = syms[sym_idx]
+                if sym_typ == STT_SECTION:
+                    rule = bias.get(typ)
+                    if rule is None: continue
+                    if addend is None:
+                        addend = self._implicit_addend(sh[7], offset, rule[0])
+                        if addend is None: continue
+                    if starts is None: starts = self._function_starts()
+                    key = shndx if self.e_type == ET_REL else None
+                    target = starts.get((key, value + addend + rule[1]))
+                    if target is not None:
+                        yield sh[7], offset, target
+                    continue
+                if not name: continue
+                if sym_typ == STT_FUNC or (sym_typ == STT_NOTYPE and shndx == 0):
+                    yield sh[7], offset, name.split('@')[0]
+
+    def direct_calls(self):
+        """
+        Yields (section index, offset, target name) for direct calls that
+        carry no relocation because the assembler or linker already resolved
+        them (e.g. calls to static functions). Call encodings are decoded
+        from the bytes of executable sections; a candidate only counts if it
+        lands exactly on a function start and no relocation touches it, which
+        keeps data and instruction fragments that merely look like calls out.
+        """
+        starts = self._function_starts()
+        relocated = {}
+        for sh in self.sections:
+            if sh[1] in (SHT_REL, SHT_RELA) and sh[7] < len(self.sections):
+                relocated.setdefault(sh[7], set()).update(offset for offset, _ in self.relocations(sh))
+        linked = self.e_type != ET_REL
+        for shndx, sh in enumerate(self.sections):
+            if not sh[2] & SHF_EXECINSTR: continue
+            base = sh[3] if linked else 0
+            key = None if linked else shndx
+            touched = relocated.get(shndx, ())
+            for at, length, target in self._decode_calls(self._code(shndx), base):
+                name = starts.get((key, target))
+                if name is None or any(p in touched for p in range(at, at + length)): continue
+                yield shndx, at, name
+
+    def _decode_calls(self, code, base):
+        """Yields (address, length, target) for every candidate direct call in `code` at `base`."""
+        e = '>' if self.big_endian else '<'
+        machine = self.e_machine
+        if machine in (3, 62):
+            # call rel32
+            for m in re.finditer(rb'\xe8', code):
+                i = m.start()
+                if i + 5 <= len(code):
+                    yield base + i, 5, base + i + 5 + struct.unpack_from('<i', code, i + 1)[0]
+        elif machine == 22:
+            # brasl (6 bytes) and bras (4 bytes), halfword aligned
+            for m in re.finditer(rb'[\xc0\xa7]', code):
+                i = m.start()
+                if i & 1 or code[i + 1:i + 2] == b'' or code[i + 1] & 0xf != 5: continue
+                if code[i] == 0xc0 and i + 6 <= len(code):
+                    yield base + i, 6, base + i + 2 * struct.unpack_from('>i', code, i + 2)[0]
+                elif code[i] == 0xa7 and i + 4 <= len(code):
+                    yield base + i, 4, base + i + 2 * struct.unpack_from('>h', code, i + 2)[0]
+        elif machine == 243:
+            # jal ra, halfword aligned (compressed code)
+            for m in re.finditer(rb'\xef', code):
+                i = m.start()
+                if i & 1 or i + 4 > len(code): continue
+                w = struct.unpack_from('<I', code, i)[0]
+                if w & 0xfff != 0xef: continue
+                imm = (w >> 31 & 1) << 20 | (w >> 12 & 0xff) << 12 | (w >> 20 & 1) << 11 | (w >> 21 & 0x3ff) << 1
+                yield base + i, 4, base + i + _signed(imm, 21)
+            # auipc ra, hi20 + jalr ra, lo12(ra)
+            for m in re.finditer(rb'\x97', code):
+                i = m.start()
+                if i & 1 or i + 8 > len(code): continue
+                hi, lo = struct.unpack_from('<II', code, i)
+                if hi & 0xfff != 0x097 or lo & 0xfffff != 0x080e7: continue
+                yield base + i, 8, base + i + _signed(hi & 0xfffff000, 32) + _signed(lo >> 20, 12)
+        elif machine in (183, 8, 40):
+            n = len(code) // 4 * 4
+            # AArch64 instructions are little endian even in big-endian images
+            words = struct.iter_unpack('<I' if machine == 183 else e + 'I', code[:n])
+            for k, (w,) in enumerate(words):
+                at = base + 4 * k
+                if machine == 183:
+                    if w >> 26 == 0x25:                                      # bl
+                        yield at, 4, at + (_signed(w & 0x3ffffff, 26) << 2)
+                elif machine == 8:
+                    if w >> 26 == 3:                                         # jal
+                        yield at, 4, (at + 4) & 0xf0000000 | (w & 0x3ffffff) << 2
+                    elif w >> 16 == 0x0411:                                  # bal
+                        yield at, 4, at + 4 + (_signed(w & 0xffff, 16) << 2)
+                elif w >> 28 != 0xf and w >> 24 & 0xf == 0xb:                # bl (ARM state)
+                    yield at, 4, at + 8 + (_signed(w & 0xffffff, 24) << 2)
+            if machine == 40:
+                # bl/blx (Thumb state): a pair of halfwords at any halfword boundary
+                halves = [h for (h,) in struct.iter_unpack(e + 'H', code[:len(code) // 2 * 2])]
+                for k in range(len(halves) - 1):
+                    hw1, hw2 = halves[k], halves[k + 1]
+                    if hw1 >> 11 != 0x1e or hw2 >> 14 != 3 or not hw2 & 0x1000 and hw2 & 1: continue
+                    at = base + 2 * k
+                    target = at + 4 + _thumb_offset(hw1, hw2)
+                    yield at, 4, target if hw2 & 0x1000 else target & ~3
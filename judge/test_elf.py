@@ -0,0 +1,219 @@
+"""
+Tests for elf.py.
+
+Each test writes a minimal ELF around a few instructions and checks what
+the reader finds in it. The code bytes encode the instructions listed
+next to them (as llvm-mc assembles or disassembles them):
+
+    python3 -m unittest test_elf      (or: python3 -m pytest test_elf.py)
+"""
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import elf
+
+SHT_PROGBITS, SHT_STRTAB = 1, 3
+SHF_ALLOC = 0x2
+STT_OBJECT = 1
+STB_GLOBAL = 1
+
+def build_elf(path, machine, sections, symbols, relocs=(), is64=True, big_endian=False, rela=True,
+              e_type=elf.ET_REL):
+    """
+    Writes an ELF file with `sections` ((name, data), executable, numbered
+    from 1), `symbols` ((name, value, type, section index, binding),
+    numbered from 1) and `relocs` ((section index, offset, symbol, type,
+    addend)) in one REL or RELA section per relocated section.
+    """
+    e = '>' if big_endian else '<'
+    shdr = struct.Struct(e + ('IIQQQQIIQQ' if is64 else 'IIIIIIIIII'))
+    ehsize = 64 if is64 else 52
+    names = bytearray(b'\0')
+    def name(text):
+        names.extend(text.encode() + b'\0')
+        return len(names) - len(text) - 1
+
+    strtab = bytearray(b'\0')
+    symtab = bytearray(24 if is64 else 16)
+    for sym_name, value, typ, shndx, bind in symbols:
+        offset = len(strtab)
+        strtab.extend(sym_name.encode() + b'\0')
+        info = bind << 4 | typ
+        if is64:
+            symtab += struct.pack(e + 'IBBHQQ', offset, info, 0, shndx, value, 0)
+        else:
+            symtab += struct.pack(e + 'IIIBBH', offset, value, 0, info, 0, shndx)
+
+    # (name, type, flags, link, info, entsize, data)
+    table = [(name(n), SHT_PROGBITS, SHF_ALLOC | elf.SHF_EXECINSTR, 0, 0, 0, data) for n, data in sections]
+    symtab_index = len(table) + 1
+    table.append((name('.symtab'), elf.SHT_SYMTAB, 0, symtab_index + 1, len(symbols) + 1, 24 if is64 else 16,
+                  bytes(symtab)))
+    table.append((name('.strtab'), SHT_STRTAB, 0, 0, 0, 0, bytes(strtab)))
+    for target in sorted({r[0] for r in relocs}):
+        fmt = struct.Struct(e + (('QQq' if rela else 'QQ') if is64 else ('IIi' if rela else 'II')))
+        data = bytearray()
+        for shndx, offset, sym, typ, addend in relocs:
+            if shndx != target: continue
+            info = sym << 32 | typ if is64 else sym << 8 | typ
+            data += fmt.pack(*((offset, info, addend) if rela else (offset, info)))
+        kind = elf.SHT_RELA if rela else elf.SHT_REL
+        table.append((name(('.rela' if rela else '.rel') + sections[target - 1][0]), kind, 0, symtab_index,
+                      target, fmt.size, bytes(data)))
+    shstrndx = len(table) + 1
+    shstrtab = name('.shstrtab')
+    table.append((shstrtab, SHT_STRTAB, 0, 0, 0, 0, bytes(names)))
+
+    body = bytearray()
+    headers = [shdr.pack(*[0] * 10)]
+    for sh_name, typ, flags, link, info, entsize, data in table:
+        offset = ehsize + len(body)
+        body += data + bytes(-len(data) % 8)
+        headers.append(shdr.pack(sh_name, typ, flags, 0, offset, len(data), link, info, 1, entsize))
+    shoff = ehsize + len(body)
+    ident = b'\x7fELF' + bytes((2 if is64 else 1, 2 if big_endian else 1, 1)) + bytes(9)
+    fmt = 'HHIQQQIHHHHHH' if is64 else 'HHIIIIIHHHHHH'
+    header = struct.pack(e + fmt, e_type, machine, 1, 0, 0, shoff, 0, ehsize, 0, 0, shdr.size,
+                         len(headers), shstrndx)
+    with open(path, 'wb') as f:
+        f.write(ident + header + body + b''.join(headers))
+
+# name: (e_machine, 64-bit, big endian, code, {offset: function defined there}, [(call offset, callee)])
+DIRECT = {
+    # call callee; ret; nop; callee: ret
+    'x86-64': (62, True, False, 'e802000000 c3 90 c3', {7: 'callee'}, [(0, 'callee')]),
+    'i386': (3, False, False, 'e802000000 c3 90 c3', {7: 'callee'}, [(0, 'callee')]),
+    # bl callee; ret; callee: ret
+    'aarch64': (183, True, False, '02000094 c0035fd6 c0035fd6', {8: 'callee'}, [(0, 'callee')]),
+    # bl callee; bx lr; callee: bx lr
+    'arm': (40, False, False, '000000eb 1eff2fe1 1eff2fe1', {8: 'callee'}, [(0, 'callee')]),
+    # nop; bl callee; blx callee2; bx lr; callee: bx lr; .align 2; callee2 (ARM state): bx lr
+    'thumb': (40, False, False, '00bf 00f003f8 00f004e8 7047 7047 0000 1eff2fe1',
+              {0xc: 'callee', 0x10: 'callee2'}, [(2, 'callee'), (6, 'callee2')]),
+    # bal callee; nop; jr ra; nop; callee: jr ra; nop
+    'mips bal': (8, False, True, '04110003 00000000 03e00008 00000000 03e00008 00000000',
+                 {0x10: 'callee'}, [(0, 'callee')]),
+    'mipsel bal': (8, False, False, '03001104 00000000 0800e003 00000000 0800e003 00000000',
+                   {0x10: 'callee'}, [(0, 'callee')]),
+    # jal callee; nop; jr ra; nop; callee: jr ra; nop
+    'mips jal': (8, False, True, '0c000004 00000000 03e00008 00000000 03e00008 00000000',
+                 {0x10: 'callee'}, [(0, 'callee')]),
+    # brasl %r14,callee; bras %r14,callee; br %r14; callee: br %r14
+    's390x': (22, True, True, 'c0e500000006 a7e50003 07fe 07fe', {0xc: 'callee'}, [(0, 'callee'), (6, 'callee')]),
+    # jal ra,callee; auipc ra,0; jalr 10(ra); c.ret; callee: c.ret
+    'riscv64': (243, True, False, 'ef00e000 97000000 e780a000 8280 8280', {0xe: 'callee'},
+                [(0, 'callee'), (4, 'callee')]),
+}
+
+# name: (e_machine, 64-bit, big endian, RELA, code, relocation offset, type, addend)
+# `main` calls the static `helper`, 16 bytes into .text.helper, through
+# the section symbol; REL keeps the addend in the instruction.
+SECTION_RELATIVE = {
+    'i386 PC32': (3, False, False, False, 'e80c000000 c3', 1, 2, None),            # call .text.helper+0xc
+    'arm CALL': (40, False, False, False, '020000eb 1eff2fe1', 0, 28, None),        # bl .text.helper+0x8
+    'thumb THM_CALL': (40, False, False, False, '00f006f8 7047', 0, 10, None),      # bl .text.helper+0xc
+    'mips 26': (8, False, True, False, '0c000004 00000000', 0, 4, None),            # jal .text.helper+0x10
+    'x86-64 PLT32': (62, True, False, True, 'e800000000 c3', 1, 4, 0xc),
+    'aarch64 CALL26': (183, True, False, True, '00000094 c0035fd6', 0, 283, 0x10),
+    'riscv64 CALL_PLT': (243, True, False, True, '97000000 e7800000', 0, 19, 0x10),
+    's390x PLT32DBL': (22, True, True, True, 'c0e500000000 07fe', 2, 20, 0x12),
+}
+
+class ElfTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix='analyze-elf-')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.tmp, name.replace(' ', '-') + '.o')
+
+    def test_direct_calls(self):
+        for name, (machine, is64, big_endian, code, funcs, calls) in DIRECT.items():
+            with self.subTest(name):
+                symbols = [('main', 0, elf.STT_FUNC, 1, STB_GLOBAL)]
+                symbols += [(func, at, elf.STT_FUNC, 1, elf.STB_LOCAL) for at, func in funcs.items()]
+                build_elf(self.path(name), machine, [('.text', bytes.fromhex(code))], symbols,
+                          is64=is64, big_endian=big_endian)
+                with elf.ElfFile(self.path(name)) as image:
+                    self.assertEqual([(at, func) for _, at, func in image.direct_calls()], calls)
+
+    def test_direct_calls_need_function_start(self):
+        # call .+8 lands inside main, not on a function
+        build_elf(self.path('inside'), 62, [('.text', bytes.fromhex('e803000000 c3 90 c3 c3'))],
+                  [('main', 0, elf.STT_FUNC, 1, STB_GLOBAL), ('callee', 7, elf.STT_FUNC, 1, elf.STB_LOCAL)])
+        with elf.ElfFile(self.path('inside')) as image:
+            self.assertEqual(list(image.direct_calls()), [])
+
+    def test_relocated_calls_are_not_direct(self):
+        build_elf(self.path('relocated'), 62, [('.text', bytes.fromhex('e800000000 c3 90 c3'))],
+                  [('main', 0, elf.STT_FUNC, 1, STB_GLOBAL), ('puts', 0, elf.STT_NOTYPE, 0, STB_GLOBAL)],
+                  [(1, 1, 2, 4, -4)])
+        with elf.ElfFile(self.path('relocated')) as image:
+            self.assertEqual(list(image.direct_calls()), [])
+            self.assertEqual(list(image.call_relocations()), [(1, 1, 'puts')])
+
+    def test_section_relative_calls(self):
+        helper = bytes(16) + bytes.fromhex('c3000000')
+        for name, (machine, is64, big_endian, rela, code, offset, typ, addend) in SECTION_RELATIVE.items():
+            with self.subTest(name):
+                symbols = [('main', 0, elf.STT_FUNC, 1, STB_GLOBAL),
+                           ('helper', 0x10, elf.STT_FUNC, 2, elf.STB_LOCAL),
+                           ('', 0, elf.STT_SECTION, 2, elf.STB_LOCAL)]
+                build_elf(self.path(name), machine, [('.text', bytes.fromhex(code)), ('.text.helper', helper)],
+                          symbols, [(1, offset, 3, typ, addend)], is64=is64, big_endian=big_endian, rela=rela)
+                with elf.ElfFile(self.path(name)) as image:
+                    self.assertEqual(list(image.call_relocations()), [(1, offset, 'helper')])
+
+    def test_call_relocation_targets(self):
+        # Functions and undefined symbols count, versions are dropped, data does not
+        symbols = [('main', 0, elf.STT_FUNC, 1, STB_GLOBAL), ('puts@GLIBC_2.2.5', 0, elf.STT_FUNC, 0, STB_GLOBAL),
+                   ('ext', 0, elf.STT_NOTYPE, 0, STB_GLOBAL), ('table', 0, STT_OBJECT, 0, STB_GLOBAL)]
+        build_elf(self.path('targets'), 62, [('.text', bytes.fromhex('e800000000' * 3 + 'c3'))], symbols,
+                  [(1, 1, 2, 4, -4), (1, 6, 3, 4, -4), (1, 11, 4, 2, -4)])
+        with elf.ElfFile(self.path('targets')) as image:
+            self.assertEqual(list(image.call_relocations()), [(1, 1, 'puts'), (1, 6, 'ext')])
+
+    def test_symbols(self):
+        # The Thumb bit is not part of the address
+        symbols = [('main', 1, elf.STT_FUNC, 1, STB_GLOBAL), ('helper', 5, elf.STT_FUNC, 1, elf.STB_LOCAL),
+                   ('puts', 0, elf.STT_FUNC, 0, STB_GLOBAL)]
+        build_elf(self.path('symbols'), 40, [('.text', bytes(8))], symbols, is64=False)
+        with elf.ElfFile(self.path('symbols')) as image:
+            self.assertEqual(image.arch, 'arm')
+            self.assertEqual(image.function_symbols(), [('main', 0, 0, 1), ('helper', 4, 0, 1)])
+            self.assertEqual(image.local_functions(), {'helper'})
+
+    def test_arch(self):
+        for machine, is64, big_endian, arch in ((62, True, False, 'x86'), (3, False, False, 'x86'),
+                                                (8, False, True, 'mips'), (8, False, False, 'mipsel'),
+                                                (22, True, True, 's390x'), (243, True, False, 'riscv64'),
+                                                (183, True, False, 'aarch64'), (2, False, True, None)):
+            with self.subTest(machine=machine, big_endian=big_endian):
+                build_elf(self.path('arch'), machine, [('.text', b'')], [], is64=is64, big_endian=big_endian)
+                with elf.ElfFile(self.path('arch')) as image:
+                    self.assertEqual(image.arch, arch)
+
+    def test_invalid(self):
+        build_elf(self.path('valid'), 62, [('.text', bytes(4))], [])
+        with open(self.path('valid'), 'rb') as f:
+            valid = f.read()
+        for name, data in (('short', valid[:40]), ('magic', b'\x7fELG' + valid[4:]),
+                           ('class', valid[:4] + b'\x03' + valid[5:]),
+                           ('truncated', valid[:-8])):
+            with self.subTest(name):
+                with open(self.path(name), 'wb') as f:
+                    f.write(data)
+                with self.assertRaisesRegex(ValueError, 'not a valid ELF file'):
+                    elf.ElfFile(self.path(name))
+
+if __name__ == '__main__':
+    unittest.main()
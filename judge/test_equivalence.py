@@ -0,0 +1,213 @@
+"""
+Equivalence tests for analyze.py.
+
+Every shortcut the analyzer takes must give exactly the answers of a
+plain full analysis. Each mode is run on bench.py dumps for every
+architecture and compared query by query:
+
+    python3 -m unittest test_equivalence      (or: python3 -m pytest test_equivalence.py)
+"""
+import os
+import re
+import sys
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import analyze
+import bench
+
+# Small enough to keep the suite quick, big enough for cycles and cross-block syscalls
+SIZE = dict(functions=150, blocks=3, instrs=6, depth=6, cycles=6)
+
+def answers(analyzer, funcs=None):
+    """Every per-function query answer, keyed by function."""
+    if funcs is None:
+        funcs = analyzer.get_all_functions()
+    return {f: (analyzer.get_direct_callees(f), analyzer.get_indirect_callees(f),
+                analyzer.get_syscalls(f), analyzer.get_indirect_syscalls(f),
+                analyzer.get_direct_instrs(f), analyzer.get_indirect_instrs(f))
+            for f in funcs}
+
+def sections(text):
+    """Splits dump text into [label or None, lines] sections."""
+    out = [[None, []]]
+    for line in text.split('\n'):
+        m = re.match(r'^[0-9a-f]+ <([^>]+)>:$', line)
+        if m: out.append([m.group(1), []])
+        out[-1][1].append(line)
+    return out
+
+def mnemonic(line):
+    """Mnemonic of a generated instruction line, or None."""
+    parts = line.split('\t')
+    return parts[2].split()[0] if len(parts) > 2 and parts[2].strip() else None
+
+def edit_dump(text, arch):
+    """
+    Returns `text` with three functions changed the way a resubmission
+    would: one loses its calls, one its syscalls, and one gains an
+    instruction. Everything else is left byte for byte.
+    """
+    d = bench.DIALECTS[arch]
+    call, syscall = d['call'][0], d['syscall'][0]
+    edited = set()
+    parts = sections(text)
+    for label, lines in parts:
+        if label is None or '_L' in label: continue
+        if not edited:
+            kept = [l for l in lines if mnemonic(l) != call]
+            if len(kept) < len(lines):
+                lines[:] = kept
+                edited.add('calls')
+        elif 'syscalls' not in edited and any(mnemonic(l) == syscall for l in lines):
+            lines[:] = [l for l in lines if mnemonic(l) != syscall]
+            edited.add('syscalls')
+        elif 'instrs' not in edited and len(lines) > 2:
+            lines.insert(2, lines[1].replace(mnemonic(lines[1]), 'xedit', 1))
+            edited.add('instrs')
+    assert len(edited) == 3, f"{arch}: could not apply every edit ({edited})"
+    return '\n'.join(line for _, lines in parts for line in lines)
+
+class EquivalenceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix='analyze-test-')
+        cls.dumps = {}
+        for arch in bench.DIALECTS:
+            text = bench.generate_dump(arch, **SIZE)
+            paths = []
+            for name, body in (('base', text), ('edited', edit_dump(text, arch))):
+                path = os.path.join(cls.tmp, f"{arch}-{name}.dump")
+                with open(path, 'w') as f:
+                    f.write(body)
+                paths.append(path)
+            cls.dumps[arch] = paths
+        cls.expected = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def full(self, path, arch):
+        if path not in self.expected:
+            self.expected[path] = answers(analyze.AssemblyAnalyzer(path, arch))
+        return self.expected[path]
+
+    def directory(self, name):
+        path = os.path.join(self.tmp, name)
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    def test_edits_change_answers(self):
+        for arch, (base, edited) in self.dumps.items():
+            with self.subTest(arch=arch):
+                self.assertNotEqual(self.full(base, arch), self.full(edited, arch))
+
+    def test_incremental(self):
+        for arch, (base, edited) in self.dumps.items():
+            with self.subTest(arch=arch):
+                previous = analyze.AssemblyAnalyzer(base, arch, incremental=True)
+                self.assertEqual(answers(previous), self.full(base, arch))
+                regraded = analyze.AssemblyAnalyzer(edited, arch, incremental=True, base=previous)
+                counts = regraded.incremental_counts
+                self.assertGreater(counts['functions_reused'], 0)
+                self.assertGreater(counts['functions_changed'], 0)
+                self.assertEqual(answers(regraded), self.full(edited, arch))
+                # And back again, on top of the regraded analysis
+                back = analyze.AssemblyAnalyzer(base, arch, base=regraded)
+                self.assertEqual(answers(back), self.full(base, arch))
+
+    def test_cache(self):
+        for arch, (base, edited) in self.dumps.items():
+            with self.subTest(arch=arch):
+                cache = analyze.AnalysisCache(self.directory(f"cache-{arch}"))
+                cold = analyze.AssemblyAnalyzer(base, arch, cache=cache)
+                warm = analyze.AssemblyAnalyzer(base, arch, cache=cache)
+                self.assertEqual((cold.cache_status, warm.cache_status), ('miss', 'hit'))
+                self.assertEqual(answers(cold), self.full(base, arch))
+                self.assertEqual(answers(warm), self.full(base, arch))
+                # Different content is a different entry
+                other = analyze.AssemblyAnalyzer(edited, arch, cache=cache)
+                self.assertEqual(other.cache_status, 'miss')
+                self.assertEqual(answers(other), self.full(edited, arch))
+
+    def test_store(self):
+        for arch, (base, edited) in self.dumps.items():
+            with self.subTest(arch=arch):
+                store = analyze.SummaryStore(self.directory(f"store-{arch}"))
+                cold = analyze.AssemblyAnalyzer(base, arch, store=store)
+                self.assertEqual(cold.store_counts['hits'], 0)
+                self.assertEqual(answers(cold), self.full(base, arch))
+                # A fresh process sees only what is on disk
+                for path in (base, edited):
+                    warm = analyze.AssemblyAnalyzer(path, arch, store=analyze.SummaryStore(store.directory))
+                    self.assertGreater(warm.store_counts['hits'], 0)
+                    self.assertEqual(answers(warm), self.full(path, arch))
+                # Sections seen byte for byte are found without fingerprinting
+                again = analyze.AssemblyAnalyzer(base, arch, store=analyze.SummaryStore(store.directory))
+                self.assertEqual(again.store_counts['raw_hits'], again.store_counts['lookups'])
+                self.assertEqual(answers(again), self.full(base, arch))
+
+    def test_store_dangling_alias(self):
+        # An alias whose entry went with an evicted pack falls back to lexing
+        base = self.dumps['x86'][0]
+        directory = self.directory('store-dangling')
+        analyze.AssemblyAnalyzer(base, 'x86', store=analyze.SummaryStore(directory))
+        store = analyze.SummaryStore(directory)
+        store.refresh('x86')
+        store.entries = {key: found for key, found in store.entries.items() if isinstance(found[1], tuple)}
+        analyzer = analyze.AssemblyAnalyzer(base, 'x86', store=store)
+        self.assertEqual(analyzer.store_counts['hits'], 0)
+        self.assertEqual(answers(analyzer), self.full(base, 'x86'))
+
+    def test_store_other_arch(self):
+        # Packs of one architecture are never loaded for another
+        store = analyze.SummaryStore(self.directory('store-shared'))
+        analyze.AssemblyAnalyzer(self.dumps['mips'][0], 'mips', store=store)
+        fresh = analyze.SummaryStore(store.directory)
+        x86 = analyze.AssemblyAnalyzer(self.dumps['x86'][0], 'x86', store=fresh)
+        self.assertEqual(x86.store_counts['hits'], 0)
+        self.assertTrue(all(name.startswith('x86-') for name in fresh.packs))
+        self.assertEqual(answers(x86), self.full(self.dumps['x86'][0], 'x86'))
+
+    def test_lazy(self):
+        for arch, (base, _) in self.dumps.items():
+            with self.subTest(arch=arch):
+                expected = self.full(base, arch)
+                for func in ('main', 'func_00100', 'missing'):
+                    lazy = analyze.AssemblyAnalyzer(base, arch, lazy=True)
+                    self.assertEqual(answers(lazy, [func]), answers(analyze.AssemblyAnalyzer(base, arch), [func]))
+                lazy = analyze.AssemblyAnalyzer(base, arch, lazy=True)
+                self.assertIsNotNone(lazy.lazy_counts)
+                self.assertEqual(answers(lazy, list(expected)), expected)
+                self.assertEqual(answers(lazy), expected)
+
+    def test_lazy_ignored_warns(self):
+        base = self.dumps['x86'][0]
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            analyzer = analyze.AssemblyAnalyzer(base, 'x86', lazy=True,
+                                                store=analyze.SummaryStore(self.directory('store-lazy')))
+        self.assertIsNone(analyzer.lazy_counts)
+        self.assertEqual(err.getvalue(), "Warning: --lazy is ignored with a summary store\n")
+        self.assertEqual(answers(analyzer), self.full(base, 'x86'))
+
+    def test_parse_jobs(self):
+        for arch, (base, _) in self.dumps.items():
+            with self.subTest(arch=arch):
+                serial = analyze.AssemblyAnalyzer(base, arch)
+                parallel = analyze.AssemblyAnalyzer(base, arch, parse_jobs=3)
+                self.assertGreater(parallel.shards, 1)
+                self.assertEqual(answers(parallel), self.full(base, arch))
+                self.assertEqual(parallel.syscall_outcomes, serial.syscall_outcomes)
+                self.assertEqual(parallel.line_counts, serial.line_counts)
+                # Workers send summaries instead of operands
+                self.assertTrue(all(block.summary is not None and not block.args
+                                    for block in parallel.raw_blocks.values()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Policy tests for analyze.py.
+
+Pins the report of every kind of rule on a small hand-written x86 dump
+whose call graph has a cycle (loop_a <-> loop_b):
+
+    python3 -m unittest test_policy      (or: python3 -m pytest test_policy.py)
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import analyze
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# main -> square, loop_a; loop_a -> loop_b -> loop_a, leaf. loop_a's
+# syscall number comes from an argument and stays unresolved ('?').
+FUNCS = (
+    ('main', ('call square', 'call loop_a', 'mov $0x3c,%eax', 'syscall', 'ret')),
+    ('square', ('imul %esi,%eax', 'ret')),
+    ('loop_a', ('call loop_b', 'mov %rdi,%rax', 'syscall', 'ret')),
+    ('loop_b', ('call loop_a', 'call leaf', 'ret')),
+    ('leaf', ('div %rcx', 'mov $0x1,%eax', 'syscall', 'ret')),
+)
+
+def objdump(funcs):
+    """objdump -d text for `funcs`, four bytes per instruction; calls name their target."""
+    addrs, addr = {}, 0x401000
+    for name, instrs in funcs:
+        addrs[name] = addr
+        addr += 4 * len(instrs)
+    lines = ['x:     file format elf64-x86-64', '', '', 'Disassembly of section .text:']
+    for name, instrs in funcs:
+        addr = addrs[name]
+        lines += ['', f"{addr:016x} <{name}>:"]
+        for instr in instrs:
+            mnem, _, ops = instr.partition(' ')
+            if mnem == 'call': ops = f"{addrs[ops]:x} <{ops}>"
+            lines.append(f"  {addr:x}:\t90 90 90 90          \t{mnem:<6} {ops}".rstrip())
+            addr += 4
+    return '\n'.join(lines) + '\n'
+
+class PolicyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix='analyze-policy-')
+        cls.dump = os.path.join(cls.tmp, 'p.dump')
+        with open(cls.dump, 'w') as f:
+            f.write(objdump(FUNCS))
+        cls.analyzer = analyze.AssemblyAnalyzer(cls.dump, 'x86')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def check(self, *rules):
+        return analyze.Policy({'rules': list(rules)}).check(self.analyzer)
+
+    def violations(self, *rules):
+        return self.check(*rules)['violations']
+
+    def test_deny(self):
+        # Globs, items in interning order, and a witness path through the cycle
+        self.assertEqual(self.violations({'id': 'no-muldiv', 'func': 'main', 'deny': {'instrs': ['div*', '*mul']}}), [
+            {'rule': 'no-muldiv', 'func': 'main', 'check': 'deny', 'kind': 'instrs',
+             'items': [{'item': 'imul', 'path': ['main', 'square']},
+                       {'item': 'div', 'path': ['main', 'loop_a', 'loop_b', 'leaf']}]}])
+        # Only main's own code
+        self.assertEqual(self.violations({'func': 'main', 'recursive': False, 'deny': {'instrs': ['div*']}}), [])
+        # Unknown names match nothing
+        self.assertEqual(self.violations({'func': 'main', 'deny': {'callees': ['printf'], 'instrs': ['x*']}}), [])
+
+    def test_allow(self):
+        # Numbers may be integers or strings in any base
+        self.assertEqual(self.violations({'id': 'io', 'func': 'main', 'allow': {'syscalls': [60, '0x1']}}), [
+            {'rule': 'io', 'func': 'main', 'check': 'allow', 'kind': 'syscalls',
+             'items': [{'item': '?', 'path': ['main', 'loop_a']}]}])
+        self.assertEqual(self.violations({'func': 'main', 'allow': {'syscalls': [60, 1, '?']}}), [])
+
+    def test_lone_question_mark(self):
+        # '?' is the unresolved syscall, not a glob matching "1"
+        self.assertEqual(self.violations({'func': 'leaf', 'deny': {'syscalls': ['?']}}), [])
+        self.assertEqual(self.violations({'func': 'leaf', 'deny': {'syscalls': ['[0-9]']}}), [
+            {'rule': 'rule-1', 'func': 'leaf', 'check': 'deny', 'kind': 'syscalls',
+             'items': [{'item': '1', 'path': ['leaf']}]}])
+
+    def test_require(self):
+        self.assertEqual(self.violations({'id': 'uses', 'func': 'loop_a', 'recursive': False,
+                                          'require': {'callees': ['leaf', 'loop_b', 'nothere']}}), [
+            {'rule': 'uses', 'func': 'loop_a', 'check': 'require', 'kind': 'callees',
+             'items': [{'item': 'leaf'}, {'item': 'nothere'}]}])
+        self.assertEqual(self.violations({'func': 'loop_a', 'require': {'callees': ['leaf', 'loop_?']}}), [])
+
+    def test_every_function(self):
+        # '*' checks each function; a callee's path ends at the callee, even around the cycle
+        self.assertEqual(self.violations({'id': 'loops', 'func': '*', 'deny': {'callees': ['loop_?']}}), [
+            {'rule': 'loops', 'func': 'loop_a', 'check': 'deny', 'kind': 'callees',
+             'items': [{'item': 'loop_a', 'path': ['loop_a', 'loop_b', 'loop_a']},
+                       {'item': 'loop_b', 'path': ['loop_a', 'loop_b']}]},
+            {'rule': 'loops', 'func': 'loop_b', 'check': 'deny', 'kind': 'callees',
+             'items': [{'item': 'loop_a', 'path': ['loop_b', 'loop_a']},
+                       {'item': 'loop_b', 'path': ['loop_b', 'loop_a', 'loop_b']}]},
+            {'rule': 'loops', 'func': 'main', 'check': 'deny', 'kind': 'callees',
+             'items': [{'item': 'loop_a', 'path': ['main', 'loop_a']},
+                       {'item': 'loop_b', 'path': ['main', 'loop_a', 'loop_b']}]}])
+
+    def test_exists(self):
+        report = self.check({'id': 'ghost', 'func': ['ghost', 'leaf'], 'require': {'instrs': ['ret']}})
+        self.assertEqual(report, {'ok': False, 'rules': 1, 'checks': 1, 'violations': [
+            {'rule': 'ghost', 'func': 'ghost', 'check': 'exists', 'error': 'no such function'}]})
+
+    def test_report(self):
+        self.assertEqual(self.check({'func': 'main', 'deny': {'instrs': ['nop']}, 'require': {'syscalls': [60]}}),
+                         {'ok': True, 'rules': 1, 'checks': 2, 'violations': []})
+
+    def test_invalid(self):
+        for doc in ([], {'rules': [{'func': 'main'}]}, {'rules': [{'func': 'main', 'deny': {'regs': []}}]},
+                    {'rules': [{'func': 'main', 'deny': {'instrs': 'div'}}]},
+                    {'rules': [{'deny': {'instrs': ['div']}}]},
+                    {'rules': [{'func': 'main', 'forbid': {'instrs': ['div']}}]}):
+            with self.subTest(doc=doc):
+                with self.assertRaises(ValueError):
+                    analyze.Policy(doc)
+
+    def run_cli(self, rules):
+        path = os.path.join(self.tmp, 'policy.json')
+        with open(path, 'w') as f:
+            json.dump({'rules': rules}, f)
+        return subprocess.run([sys.executable, os.path.join(HERE, 'analyze.py'), self.dump,
+                               '--arch', 'x86', '--policy', path],
+                              capture_output=True, text=True, timeout=60)
+
+    def test_exit_status(self):
+        ok = self.run_cli([{'func': 'main', 'allow': {'syscalls': [1, 60, '?']}}])
+        self.assertEqual(ok.returncode, 0, ok.stderr)
+        self.assertTrue(json.loads(ok.stdout)['policy']['ok'])
+        violated = self.run_cli([{'func': 'main', 'deny': {'instrs': ['div']}}])
+        self.assertEqual(violated.returncode, 1, violated.stderr)
+        self.assertEqual(json.loads(violated.stdout)['policy']['violations'][0]['items'],
+                         [{'item': 'div', 'path': ['main', 'loop_a', 'loop_b', 'leaf']}])
+
+if __name__ == '__main__':
+    unittest.main()
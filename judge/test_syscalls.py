@@ -0,0 +1,123 @@
+"""
+Syscall resolution tests for analyze.py.
+
+Pins the rules of _resolve_syscalls on tiny hand-written dumps: the
+number at a block's entry is what all its predecessors agree on, '?'
+when they disagree or when there is none, and on MIPS a branch's delay
+slot still runs before the fall-through:
+
+    python3 -m unittest test_syscalls      (or: python3 -m pytest test_syscalls.py)
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import analyze
+
+# (label, instructions); "@label" is a branch target
+X86 = (
+    ('entry', ('syscall', 'ret')),
+    # Both predecessors set 60
+    ('a1', ('mov $0x3c,%eax', 'jmp @join')),
+    ('a2', ('mov $0x3c,%eax',)),
+    ('join', ('syscall', 'ret')),
+    # 1 from one predecessor, 60 from the other
+    ('d1', ('mov $0x1,%eax', 'jmp @meet')),
+    ('d2', ('mov $0x3c,%eax',)),
+    ('meet', ('syscall', 'ret')),
+    # A self loop passes the number on
+    ('l0', ('mov $0x4,%eax',)),
+    ('l1', ('syscall', 'jne @l1')),
+    ('own', ('mov %rdi,%rax', 'syscall', 'mov $0x5,%eax', 'syscall', 'ret')),
+)
+
+MIPS = (
+    # Falls through after the delay slot, and branches to n2
+    ('n0', ('beqz a0,@n2', 'li v0,4003')),
+    ('n1', ('syscall',)),
+    ('n2', ('syscall', 'jr ra', 'nop')),
+    # Only reachable past "jr ra" and its delay slot
+    ('n3', ('syscall', 'jr ra', 'nop')),
+    # An unconditional branch does not fall through into m1
+    ('m0', ('b @m2', 'li v0,4004')),
+    ('m1', ('li v0,4001',)),
+    ('m2', ('syscall', 'jr ra', 'nop')),
+)
+
+def objdump(file_format, blocks, width):
+    """objdump -d text for `blocks`, one label section each."""
+    addrs, addr = {}, 0x400000
+    for label, instrs in blocks:
+        addrs[label] = addr
+        addr += 4 * len(instrs)
+    lines = [f"x:     file format {file_format}", '', '', 'Disassembly of section .text:']
+    for label, instrs in blocks:
+        addr = addrs[label]
+        lines += ['', f"{addr:0{width}x} <{label}>:"]
+        for instr in instrs:
+            mnem, _, ops = instr.partition(' ')
+            if '@' in ops:
+                head, _, target = ops.rpartition('@')
+                ops = f"{head}{addrs[target]:x} <{target}>"
+            lines.append(f"  {addr:x}:\t00000000 \t{mnem}\t{ops}".rstrip())
+            addr += 4
+    return '\n'.join(lines) + '\n'
+
+class SyscallTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp(prefix='analyze-syscalls-')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def analyze(self, arch, file_format, blocks, width):
+        path = os.path.join(self.tmp, f"{arch}.dump")
+        with open(path, 'w') as f:
+            f.write(objdump(file_format, blocks, width))
+        analyzer = analyze.AssemblyAnalyzer(path, arch)
+        return analyzer, {label: block.syscalls for label, block in analyzer.raw_blocks.items() if block.syscalls}
+
+    def test_x86(self):
+        analyzer, syscalls = self.analyze('x86', 'elf64-x86-64', X86, 16)
+        self.assertEqual(syscalls, {
+            'entry': {0: '?'},          # no predecessor
+            'join': {0: '60'},          # predecessors agree
+            'meet': {0: '?'},           # predecessors disagree
+            'l1': {0: '4'},
+            'own': {1: '?', 3: '5'},    # the block's own writes come first
+        })
+        self.assertEqual(analyzer.syscall_outcomes,
+                         {'immediate': 0, 'same_block': 2, 'predecessor': 2, 'unknown': 2})
+
+    def test_mips_delay_slot(self):
+        analyzer, syscalls = self.analyze('mips', 'elf32-tradbigmips', MIPS, 8)
+        self.assertEqual(analyzer.raw_blocks['n0'].flow, (('n2',), True))
+        self.assertEqual(analyzer.raw_blocks['m0'].flow, (('m2',), False))
+        self.assertEqual(syscalls, {
+            'n1': {0: '4003'},          # set in the delay slot, then fall-through
+            'n2': {0: '4003'},          # both predecessors carry it
+            'n3': {0: '?'},             # "jr ra; nop" does not fall through
+            'm2': {0: '?'},             # 4004 from m0's delay slot, 4001 from m1
+        })
+        self.assertEqual(analyzer.syscall_outcomes,
+                         {'immediate': 0, 'same_block': 0, 'predecessor': 2, 'unknown': 2})
+
+    def test_lazy_agrees(self):
+        # Lazy mode finds predecessors its own way; the answers must not change
+        for arch, file_format, blocks, width in (('x86', 'elf64-x86-64', X86, 16),
+                                                 ('mips', 'elf32-tradbigmips', MIPS, 8)):
+            with self.subTest(arch=arch):
+                full, expected = self.analyze(arch, file_format, blocks, width)
+                lazy = analyze.AssemblyAnalyzer(os.path.join(self.tmp, f"{arch}.dump"), arch, lazy=True)
+                # Every label falls into the first function's body
+                func, = full.get_all_functions()
+                self.assertEqual(lazy.get_indirect_syscalls(func), full.get_indirect_syscalls(func))
+                self.assertEqual({label: lazy.raw_blocks[label].syscalls for label in expected}, expected)
+
+if __name__ == '__main__':
+    unittest.main()